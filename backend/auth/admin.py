@@ -0,0 +1,21 @@
+import secrets
+from typing import Optional
+from fastapi import Header, HTTPException, status
+
+from config import ADMIN_TOKEN, logger
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Check a presented token against ADMIN_TOKEN in constant time."""
+    return bool(ADMIN_TOKEN and token and secrets.compare_digest(token, ADMIN_TOKEN))
+
+async def verify_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Guard for operational endpoints. The X-Admin-Token header must match the
+    ADMIN_TOKEN environment variable; without one configured they stay disabled.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        logger.warning("Rejected admin request with invalid token")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
+    return True
\ No newline at end of file
@@ -1,4 +1,5 @@
-from fastapi import Depends, HTTPException, status
+from typing import Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 from jwt.exceptions import PyJWTError
@@ -8,18 +9,41 @@ from auth.tokens import JWT_SECRET_KEY, JWT_ALGORITHM
 
 logger = logging.getLogger(__name__)
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
     Verify the JWT token and return the user_id if valid.
     This will be used as a dependency for protected routes.
     """
+    return decode_access_token(credentials.credentials)
+
+async def verify_stream_token(
+    token: Optional[str] = Query(default=None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+):
+    """
+    Same check as verify_token for streaming endpoints. Browsers' EventSource
+    cannot set headers, so a short-lived stream token (POST /api/live/token)
+    may come as ?token= instead; access tokens are not accepted there.
+    """
+    if credentials is not None:
+        return decode_access_token(credentials.credentials)
+    if token:
+        return decode_access_token(token, token_type="stream")
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+def decode_access_token(token: str, token_type: str = "access") -> str:
+    """Decode an access (or stream) token and return its user_id, raising 401 otherwise."""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
         
-        # Check if token is an access token, not a refresh token
-        if payload.get("type") != "access":
+        # Check the token is of the expected type, e.g. not a refresh token
+        if payload.get("type") != token_type:
             logger.warning("Invalid token type for authorization")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -8,6 +8,7 @@ JWT_SECRET_KEY = "iGNixuhaOM0zSYabR8XxYiGYMpe5yzNN+e9PU49Z2ZjLnR5iQbAKumuN3AQyFk
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_MINUTES = 30
 REFRESH_TOKEN_EXPIRATION_DAYS = 7
+STREAM_TOKEN_EXPIRATION_SECONDS = 60
 
 def generate_jwt_token(user_id: str) -> str:
     """
@@ -24,6 +25,22 @@ def generate_jwt_token(user_id: str) -> str:
     
     return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
+def generate_stream_token(user_id: str) -> str:
+    """
+    Generate a short-lived token that only opens live update streams. It is
+    meant for the ?token= query parameter, where a URL may end up in logs.
+    """
+    expiration = datetime.utcnow() + timedelta(seconds=STREAM_TOKEN_EXPIRATION_SECONDS)
+    
+    payload = {
+        "sub": user_id,
+        "exp": expiration,
+        "iat": datetime.utcnow(),
+        "type": "stream"
+    }
+    
+    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
 def generate_refresh_token(user_id: str) -> str:
     """
     Generate a refresh token for the given user_id.
@@ -11,4 +11,51 @@ logger = logging.getLogger(__name__)
 
 # Configuration variables
 SUPABASE_URL = os.getenv("PYTHON_SUPABASE_URL")
-SUPABASE_KEY = os.getenv("PYTHON_SUPABASE_ANON_KEY") 
\ No newline at end of file
+SUPABASE_KEY = os.getenv("PYTHON_SUPABASE_ANON_KEY") 
+# Storage call deadlines and resilience
+STORAGE_REQUEST_BUDGET_SECONDS = float(os.getenv("STORAGE_REQUEST_BUDGET_SECONDS", "10"))
+STORAGE_CALL_TIMEOUT_SECONDS = float(os.getenv("STORAGE_CALL_TIMEOUT_SECONDS", "5"))
+STORAGE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("STORAGE_CONNECT_TIMEOUT_SECONDS", "2"))
+STORAGE_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("STORAGE_HEDGE_MIN_DELAY_SECONDS", "0.05"))
+STORAGE_POOL_SIZE = int(os.getenv("STORAGE_POOL_SIZE", "20"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Response compression
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+
+# Admission control
+RATE_LIMIT_GLOBAL_PER_SECOND = float(os.getenv("RATE_LIMIT_GLOBAL_PER_SECOND", "200"))
+RATE_LIMIT_GLOBAL_BURST = float(os.getenv("RATE_LIMIT_GLOBAL_BURST", "400"))
+RATE_LIMIT_USER_PER_SECOND = float(os.getenv("RATE_LIMIT_USER_PER_SECOND", "10"))
+RATE_LIMIT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "20"))
+RATE_LIMIT_MAX_TRACKED_USERS = int(os.getenv("RATE_LIMIT_MAX_TRACKED_USERS", "10000"))
+# Unauthenticated routes are limited per client address instead
+RATE_LIMIT_CLIENT_PER_SECOND = float(os.getenv("RATE_LIMIT_CLIENT_PER_SECOND", "5"))
+RATE_LIMIT_CLIENT_BURST = float(os.getenv("RATE_LIMIT_CLIENT_BURST", "20"))
+# Proxies in front of the app that append to X-Forwarded-For (1 on Heroku)
+RATE_LIMIT_TRUSTED_PROXY_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_PROXY_HOPS", "0"))
+STORAGE_MAX_CONCURRENCY = int(os.getenv("STORAGE_MAX_CONCURRENCY", "16"))
+STORAGE_MAX_QUEUE = int(os.getenv("STORAGE_MAX_QUEUE", "64"))
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Request profiling
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_THRESHOLD_MS = float(os.getenv("PROFILE_SLOW_THRESHOLD_MS", "1000"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_RING_SIZE = int(os.getenv("PROFILE_RING_SIZE", "50"))
+
+# Transaction archive (disabled unless a directory is configured)
+TRANSACTION_ARCHIVE_DIR = os.getenv("TRANSACTION_ARCHIVE_DIR")
+ARCHIVE_HOT_MONTHS = int(os.getenv("ARCHIVE_HOT_MONTHS", "3"))
+
+# Live dashboard updates
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "100"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+LIVE_MAX_CONNECTIONS_PER_USER = int(os.getenv("LIVE_MAX_CONNECTIONS_PER_USER", "5"))
+
+# Budget alerts (percent of the monthly limit)
+BUDGET_ALERT_THRESHOLDS = tuple(int(t) for t in os.getenv("BUDGET_ALERT_THRESHOLDS", "80,100").split(","))
+BUDGET_RECENT_ALERTS = int(os.getenv("BUDGET_RECENT_ALERTS", "20"))
\ No newline at end of file
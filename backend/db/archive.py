@@ -0,0 +1,386 @@
+"""
+Archive tier for cold transaction history.
+
+Closed months of a user's transactions are compacted into one immutable
+segment file per month under TRANSACTION_ARCHIVE_DIR/<user_id>/. A segment
+stores fixed-width little-endian columns that are memory-mapped and read in
+place through memoryview casts:
+
+    id        int64
+    date      int64   (unix microseconds, UTC)
+    offset    int32   (UTC offset in seconds, NAIVE_OFFSET for naive values)
+    cents     int64
+    type      int32   (dictionary code)
+    category  int32   (dictionary code)
+    location  int32   (dictionary code)
+    recurring int8
+
+followed by a zlib-compressed JSON block with the dictionaries and the free
+text descriptions. A per-user manifest records the watermark month and the
+segment file of every month: every month up to and including the
+watermark is archived, so only newer rows (and rows without a date) have
+to be fetched from Supabase.
+
+Rows are filed under the UTC month of their instant (naive values under
+their own month), which is what the Supabase date filter for hot rows
+compares against.
+
+The archive is a local cache of Supabase data: deleting the directory while
+the service is stopped is always safe.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import uuid
+import zlib
+from array import array
+from collections import defaultdict
+from datetime import datetime, timezone, timedelta, date
+from typing import Any, Dict, Iterable, List, Optional
+
+from config import logger, TRANSACTION_ARCHIVE_DIR, ARCHIVE_HOT_MONTHS
+from utils.money import storage_cents, cents_to_decimal
+
+MAGIC = b"FTCA"
+VERSION = 2
+HEADER = struct.Struct("<4sHHIQ")  # magic, version, flags, rows, metadata length
+NAIVE_OFFSET = -(2 ** 31)
+
+COLUMNS = (
+    ("id", "q"),
+    ("date", "q"),
+    ("offset", "i"),
+    ("cents", "q"),
+    ("type", "i"),
+    ("category", "i"),
+    ("location", "i"),
+    ("recurring", "b"),
+)
+DICTIONARY_COLUMNS = {"type": "transaction_type", "category": "category_type", "location": "location"}
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def transaction_month(value: Any) -> Optional[str]:
+    """
+    'YYYY-MM' for a transaction_date value (the UTC month for values with an
+    offset), or None if it has no usable date.
+    """
+    if not value or not isinstance(value, str) or len(value) < 7:
+        return None
+    if len(value) <= 19 or value.endswith(("Z", "+00:00")):
+        # Dates, naive timestamps and UTC timestamps: the prefix is the month
+        return value[:7]
+    try:
+        timestamp = _parse_timestamp(value)
+    except ValueError:
+        return value[:7]
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.strftime("%Y-%m")
+
+
+def shift_month(month: str, delta: int) -> str:
+    year, mon = int(month[:4]), int(month[5:7])
+    index = year * 12 + (mon - 1) + delta
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def current_cutoff(today: Optional[date] = None) -> str:
+    """First month that is still hot; everything before it is closed."""
+    today = today or datetime.now(timezone.utc).date()
+    return shift_month(today.strftime("%Y-%m"), -(ARCHIVE_HOT_MONTHS - 1))
+
+
+def _parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _epoch_micros(timestamp: datetime) -> int:
+    """Exact microseconds since the epoch; naive values are read as UTC."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return (timestamp - _EPOCH) // timedelta(microseconds=1)
+
+
+def _format_timestamp(micros: int, offset: int) -> str:
+    """Inverse of _epoch_micros plus the stored offset: the original ISO value."""
+    value = _EPOCH + timedelta(microseconds=micros)
+    if offset == NAIVE_OFFSET:
+        return value.replace(tzinfo=None).isoformat()
+    return value.astimezone(timezone(timedelta(seconds=offset))).isoformat()
+
+
+def write_segment(path: str, user_id: str, month: str, rows: List[Dict[str, Any]]) -> None:
+    """Encode one month of transaction rows into a segment file (atomically)."""
+    columns = {name: array(code) for name, code in COLUMNS}
+    dictionaries = {name: {} for name in DICTIONARY_COLUMNS}
+    descriptions = []
+
+    for row in rows:
+        timestamp = _parse_timestamp(row["transaction_date"])
+        columns["id"].append(int(row["id"]))
+        columns["date"].append(_epoch_micros(timestamp))
+        offset = timestamp.utcoffset()
+        columns["offset"].append(NAIVE_OFFSET if offset is None else int(offset.total_seconds()))
+        columns["cents"].append(storage_cents(row.get("amount")))
+        for column, source in DICTIONARY_COLUMNS.items():
+            values = dictionaries[column]
+            columns[column].append(values.setdefault(row.get(source), len(values)))
+        columns["recurring"].append(1 if row.get("is_recurring") else 0)
+        descriptions.append(row.get("description"))
+
+    metadata = zlib.compress(json.dumps({
+        "user_id": user_id,
+        "month": month,
+        "dictionaries": {name: list(values) for name, values in dictionaries.items()},
+        "descriptions": descriptions,
+    }).encode())
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(rows), len(metadata)))
+        for name, _ in COLUMNS:
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(columns[name].tobytes())
+        f.write(b"\0" * (_align(f.tell()) - f.tell()))
+        f.write(metadata)
+    os.replace(tmp_path, path)
+
+
+class ArchiveSegment:
+    """
+    A memory-mapped, read-only month of archived transactions. Segments are
+    never closed explicitly: the mapping goes away with the last reference,
+    so readers can keep using one that was evicted meanwhile.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, version, _, self.rows, metadata_length = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a transaction archive segment: {path}")
+
+        self.columns: Dict[str, memoryview] = {}
+        offset = HEADER.size
+        for name, code in COLUMNS:
+            offset = _align(offset)
+            size = self.rows * struct.calcsize(code)
+            self.columns[name] = view[offset:offset + size].cast(code)
+            offset += size
+        offset = _align(offset)
+        metadata = json.loads(zlib.decompress(view[offset:offset + metadata_length]))
+        self.month = metadata["month"]
+        self.user_id = metadata["user_id"]
+        self.dictionaries = metadata["dictionaries"]
+        self._descriptions = metadata["descriptions"]
+        self._summary = None
+
+    def summary(self) -> Dict[str, Any]:
+        """Income, expense and per-category expense cents, scanned straight off the columns."""
+        if self._summary is None:
+            types = self.dictionaries["type"]
+            categories = self.dictionaries["category"]
+            totals = defaultdict(int)
+            by_category = defaultdict(int)
+            for type_code, category_code, cents in zip(
+                self.columns["type"], self.columns["category"], self.columns["cents"]
+            ):
+                transaction_type = types[type_code]
+                totals[transaction_type] += cents
+                if transaction_type == "expense":
+                    by_category[categories[category_code]] += cents
+            self._summary = {
+                "income": totals["income"],
+                "expense": totals["expense"],
+                "categories": dict(by_category),
+            }
+        return self._summary
+
+    def materialize(self, columns: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Rebuild Supabase-shaped row dicts (optionally only some columns)."""
+        decoders = {
+            "id": lambda i: self.columns["id"][i],
+            "user_id": lambda i: self.user_id,
+            "amount": lambda i: str(cents_to_decimal(self.columns["cents"][i])),
+            "transaction_type": lambda i: self.dictionaries["type"][self.columns["type"][i]],
+            "category_type": lambda i: self.dictionaries["category"][self.columns["category"][i]],
+            "location": lambda i: self.dictionaries["location"][self.columns["location"][i]],
+            "description": lambda i: self._descriptions[i],
+            "is_recurring": lambda i: bool(self.columns["recurring"][i]),
+            "transaction_date": lambda i: _format_timestamp(self.columns["date"][i], self.columns["offset"][i]),
+        }
+        selected = [(name, decoders[name]) for name in (columns or decoders) if name in decoders]
+        return [{name: decode(i) for name, decode in selected} for i in range(self.rows)]
+
+
+class TransactionArchive:
+    """
+    Per-user archive directories with an in-process cache of open segments.
+
+    The lock only guards the in-memory state and the (tiny) manifest: segment
+    files are read, encoded and written outside it, because snapshot() and
+    invalidate() take it on the event loop thread.
+    """
+
+    def __init__(self, root: Optional[str]):
+        self.root = root
+        self._lock = threading.Lock()
+        self._segments: Dict[str, Dict[str, ArchiveSegment]] = {}
+        self._watermarks: Dict[str, Optional[str]] = {}
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._compacting: set = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    def _user_dir(self, user_id: str) -> str:
+        return os.path.join(self.root, str(user_id))
+
+    def _manifest_path(self, user_id: str) -> str:
+        return os.path.join(self._user_dir(user_id), "manifest.json")
+
+    def _read_manifest(self, user_id: str):
+        """(watermark, {month: segment}) from disk; empty if missing or unreadable."""
+        try:
+            with open(self._manifest_path(user_id)) as f:
+                manifest = json.load(f)
+            segments = {
+                month: ArchiveSegment(os.path.join(self._user_dir(user_id), name))
+                for month, name in manifest["segments"].items()
+            }
+            return manifest["through"], segments
+        except FileNotFoundError:
+            return None, {}
+        except (ValueError, OSError, TypeError, KeyError, AttributeError) as e:
+            logger.warning(f"Discarding unreadable transaction archive for user {user_id}: {e}")
+            return None, {}
+
+    def _load(self, user_id: str) -> None:
+        with self._lock:
+            if user_id in self._watermarks:
+                return
+        watermark, segments = self._read_manifest(user_id)
+        with self._lock:
+            if user_id not in self._watermarks:
+                self._watermarks[user_id] = watermark
+                self._segments[user_id] = segments
+
+    def snapshot(self, user_id: str):
+        """(watermark month, segments up to it, generation) for a user."""
+        self._load(user_id)
+        with self._lock:
+            segments = [self._segments[user_id][month] for month in sorted(self._segments[user_id])]
+            return self._watermarks[user_id], segments, self._generations[user_id]
+
+    def compact(self, user_id: str, rows: List[Dict[str, Any]], through: str, generation: int) -> bool:
+        """
+        Archive `rows` (every dated row after the current watermark up to and
+        including `through`) and move the watermark. Skipped if the user's
+        history changed since the rows were read, or while another compaction
+        for the user is running.
+        """
+        self._load(user_id)
+        with self._lock:
+            current = self._watermarks[user_id]
+            if (self._generations[user_id] != generation or user_id in self._compacting
+                    or (current is not None and current >= through)):
+                return False
+            self._compacting.add(user_id)
+        try:
+            return self._compact(user_id, rows, current, through, generation)
+        finally:
+            with self._lock:
+                self._compacting.discard(user_id)
+
+    def _compact(self, user_id: str, rows: List[Dict[str, Any]], current: Optional[str], through: str, generation: int) -> bool:
+        by_month = defaultdict(list)
+        for row in rows:
+            month = transaction_month(row.get("transaction_date"))
+            if month is not None and month <= through and (current is None or month > current):
+                by_month[month].append(row)
+
+        user_dir = self._user_dir(user_id)
+        os.makedirs(user_dir, exist_ok=True)
+        written = {}
+        for month, month_rows in by_month.items():
+            # Unique names: readers may still map an evicted segment of the same month
+            path = os.path.join(user_dir, f"{month}.{uuid.uuid4().hex[:12]}.seg")
+            write_segment(path, user_id, month, month_rows)
+            written[month] = ArchiveSegment(path)
+
+        with self._lock:
+            if self._generations[user_id] != generation or self._watermarks[user_id] != current:
+                installed = False
+            else:
+                self._segments[user_id].update(written)
+                self._write_manifest(user_id, through)
+                self._watermarks[user_id] = through
+                installed = True
+            referenced = {os.path.basename(segment.path) for segment in self._segments[user_id].values()}
+
+        # Drop files of lost races and of compactions interrupted before their manifest
+        for name in os.listdir(user_dir):
+            if name.endswith(".seg") and name not in referenced:
+                _remove_quietly(os.path.join(user_dir, name))
+        if installed:
+            logger.info(f"Archived transactions through {through} for user {user_id} ({len(by_month)} months)")
+        return installed
+
+    def invalidate(self, user_id: str, month: str) -> None:
+        """Pull the watermark back below `month` after a change to archived history."""
+        self._load(user_id)
+        with self._lock:
+            self._generations[user_id] += 1
+            watermark = self._watermarks[user_id]
+            if watermark is None or month > watermark:
+                return
+            new_watermark = shift_month(month, -1)
+            evicted = [self._segments[user_id].pop(m) for m in list(self._segments[user_id]) if m >= month]
+            self._write_manifest(user_id, new_watermark)
+            self._watermarks[user_id] = new_watermark
+        # Readers holding an evicted segment keep using it; its mapping is
+        # released with the last reference (unlinking a mapped file is safe)
+        for segment in evicted:
+            _remove_quietly(segment.path)
+        logger.info(f"Transaction archive for user {user_id} rolled back to {new_watermark}")
+
+    def _write_manifest(self, user_id: str, through: str) -> None:
+        path = self._manifest_path(user_id)
+        segments = {month: os.path.basename(segment.path) for month, segment in self._segments[user_id].items()}
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"through": through, "segments": segments}, f)
+        os.replace(f"{path}.tmp", path)
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+transaction_archive = TransactionArchive(TRANSACTION_ARCHIVE_DIR)
+
+
+def invalidate_archived_rows(action: str, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+    """Entity listener: writes that touch archived months roll the watermark back."""
+    if not transaction_archive.enabled:
+        return
+    for row in (new_row, old_row):
+        if not row or not row.get("user_id"):
+            continue
+        month = transaction_month(row.get("transaction_date"))
+        if month is not None:
+            transaction_archive.invalidate(str(row["user_id"]), month)
@@ -1,59 +1,143 @@
-from typing import Dict, Any, List
+"""
+Generic Supabase CRUD helpers.
+
+Some tables have entity listeners that keep in-process state in step with
+storage: the transaction archive and the budget counters. Every write to
+those tables must go through create_entity, update_entity or delete_entity
+in this process, or that state goes stale. A write whose outcome is unknown
+(a timeout, an open breaker, a server error) is reported to the listeners
+as action "unknown" with the submitted and previous rows, and listeners
+drop whatever those rows might have changed.
+"""
+import asyncio
+from collections import defaultdict
+from typing import Dict, Any, List, Optional, Callable, Tuple
 from fastapi import HTTPException
 from pydantic import BaseModel
+from postgrest.exceptions import APIError
 from uuid import UUID
 from db.database import supabase
+from db.resilience import run_storage_call, StorageUnavailable, is_server_error
 from config import logger
 from utils.helpers import prepare_data_for_supabase
+from models.base import money_fields
+from db.archive import transaction_archive, invalidate_archived_rows, current_cutoff, shift_month, transaction_month, ArchiveSegment
+
+# Listeners called as listener(action, new_row, old_row) after a write that
+# succeeded, or with action "unknown" after one that may have been committed
+EntityListener = Callable[[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]], None]
+_entity_listeners: Dict[str, List[EntityListener]] = defaultdict(list)
+
+def add_entity_listener(table_name: str, listener: EntityListener) -> None:
+    """Register a callback for creates, updates and deletes on a table."""
+    _entity_listeners[table_name].append(listener)
+
+# Hooks called as hook(new_row, old_row) just before a write is sent, and
+# again once its listeners have run, whatever the outcome
+WriteHook = Callable[[Optional[Dict[str, Any]], Optional[Dict[str, Any]]], None]
+_write_hooks: Dict[str, List[Tuple[WriteHook, WriteHook]]] = defaultdict(list)
+
+def add_write_hooks(table_name: str, started: WriteHook, finished: WriteHook) -> None:
+    """Register callbacks around every write to a table, e.g. to track writes in flight."""
+    _write_hooks[table_name].append((started, finished))
+
+def _run_write_hooks(table_name: str, finished: bool, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+    for started_hook, finished_hook in _write_hooks.get(table_name, ()):
+        try:
+            (finished_hook if finished else started_hook)(new_row, old_row)
+        except Exception as e:
+            logger.error(f"Write hook failed on {table_name}: {str(e)}")
+
+def _notify_listeners(table_name: str, action: str, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+    for listener in _entity_listeners.get(table_name, ()):
+        try:
+            listener(action, new_row, old_row)
+        except Exception as e:
+            logger.error(f"Entity listener failed for {action} on {table_name}: {str(e)}")
+
+def _write_may_have_landed(error: Exception) -> bool:
+    """False only for failures that clearly left storage unchanged (4xx responses)."""
+    if isinstance(error, StorageUnavailable):
+        return True
+    if isinstance(error, APIError):
+        return is_server_error(error)
+    return not isinstance(error, HTTPException)
+
+def _notify_failed_write(table_name: str, error: Exception, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+    if _write_may_have_landed(error):
+        logger.warning(f"Write to {table_name} failed with an unknown outcome: {str(error)}")
+        _notify_listeners(table_name, "unknown", new_row, old_row)
+
+def _validate_user_id(user_id) -> str:
+    """Validate UUID format (but don't try to modify it)."""
+    try:
+        if isinstance(user_id, UUID):
+            # Already a UUID object, convert to string for Supabase
+            return str(user_id)
+        # Validate format by creating a UUID object (not stored)
+        UUID(user_id)
+        return user_id
+    except ValueError:
+        logger.error(f"Invalid UUID format: {user_id}")
+        raise HTTPException(status_code=400, detail="Invalid user ID format")
 
 async def create_entity(entity: BaseModel, table_name: str) -> Dict[str, Any]:
     """Generic function to create an entity in the database."""
+    data = None
+    writing = False
     try:
         # Get data as dict and process it for Supabase
         raw_data = entity.model_dump()
         logger.info(f"Creating entity in {table_name}: {raw_data}")
         
         # Process data without modifying original
-        data = prepare_data_for_supabase(raw_data)
+        data = prepare_data_for_supabase(raw_data, money_fields(type(entity)))
         
-        response = supabase.table(table_name).insert(data).execute()
+        _run_write_hooks(table_name, False, data, None)
+        writing = True
+        response = await run_storage_call(lambda: supabase.table(table_name).insert(data).execute())
         if not response.data:
             logger.error(f"Failed to create entity in {table_name}")
             raise HTTPException(status_code=400, detail="Failed to create entity")
         logger.info(f"Successfully created entity in {table_name}: {response.data[0]}")
+        _notify_listeners(table_name, "create", response.data[0], None)
         return response.data[0]
+    except StorageUnavailable as e:
+        if writing:
+            _notify_failed_write(table_name, e, data, None)
+        raise
     except Exception as e:
+        if writing:
+            _notify_failed_write(table_name, e, data, None)
         logger.error(f"Error creating entity in {table_name}: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if writing:
+            _run_write_hooks(table_name, True, data, None)
 
 async def get_entity_by_id(entity_id: int, table_name: str) -> Dict[str, Any]:
     """Generic function to get an entity by ID."""
     try:
-        response = supabase.table(table_name).select("*").eq("id", entity_id).execute()
+        response = await run_storage_call(lambda: supabase.table(table_name).select("*").eq("id", entity_id).execute(), hedge=True)
         if not response.data:
             raise HTTPException(status_code=404, detail=f"Entity not found in {table_name}")
         return response.data[0]
+    except StorageUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-async def get_entities_by_user(user_id: str, table_name: str) -> List[Dict[str, Any]]:
-    """Generic function to get all entities for a user."""
+async def get_entities_by_user(user_id: str, table_name: str, columns: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Generic function to get all entities for a user.
+    When columns are given only those are selected from the table.
+    """
     try:
-        # Validate UUID format (but don't try to modify it)
-        try:
-            if isinstance(user_id, UUID):
-                # Already a UUID object, convert to string for Supabase
-                user_id_str = str(user_id)
-            else:
-                # Validate format by creating a UUID object (not stored)
-                UUID(user_id)
-                user_id_str = user_id
-        except ValueError:
-            logger.error(f"Invalid UUID format: {user_id}")
-            raise HTTPException(status_code=400, detail="Invalid user ID format")
-            
+        user_id_str = _validate_user_id(user_id)
+        
+        selection = ",".join(columns) if columns else "*"
         logger.info(f"Getting entities from {table_name} for user: {user_id}")
-        response = supabase.table(table_name).select("*").eq("user_id", user_id_str).execute()
+        response = await run_storage_call(lambda: supabase.table(table_name).select(selection).eq("user_id", user_id_str).execute(), hedge=True)
         
         # Process the data to handle null dates properly
         if response.data:
@@ -85,43 +169,148 @@ async def get_entities_by_user(user_id: str, table_name: str) -> List[Dict[str,
         
         logger.info(f"Found {len(response.data)} entities in {table_name} for user: {user_id}")
         return response.data
+    except StorageUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error getting entities from {table_name} for user {user_id}: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+def _is_closed(row: Dict[str, Any], through: str) -> bool:
+    month = transaction_month(row.get("transaction_date"))
+    return month is not None and month <= through
+
+def _compact_archive(user_id: str, rows: List[Dict[str, Any]], through: str, generation: int) -> None:
+    try:
+        transaction_archive.compact(user_id, rows, through, generation)
+    except Exception as e:
+        logger.error(f"Error archiving transactions for user {user_id}: {str(e)}")
+
+async def get_transactions_with_archive(user_id: str, columns: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], List[ArchiveSegment]]:
+    """
+    Get a user's transactions as (hot rows, archived month segments).
+    Only rows newer than the archive watermark (or without a date) come from
+    Supabase. A full read that still holds closed months, and got every row
+    the exact count reports, compacts them in the background so the next read
+    skips them.
+    """
+    try:
+        user_id_str = _validate_user_id(user_id)
+        selection = ",".join(columns) if columns else "*"
+        if not transaction_archive.enabled:
+            response = await run_storage_call(lambda: supabase.table("transactions").select(selection).eq("user_id", user_id_str).execute(), hedge=True)
+            return response.data or [], []
+        
+        watermark, segments, generation = transaction_archive.snapshot(user_id_str)
+        # Only full rows can be archived
+        through = shift_month(current_cutoff(), -1)
+        may_compact = columns is None and (watermark is None or watermark < through)
+        # PostgREST caps unpaged reads (max-rows), so compaction needs the exact
+        # count to tell a complete read from a truncated one
+        count = "exact" if may_compact else None
+        query = lambda: supabase.table("transactions").select(selection, count=count).eq("user_id", user_id_str)
+        if watermark is None:
+            response = await run_storage_call(lambda: query().execute(), hedge=True)
+        else:
+            hot_from = f"{shift_month(watermark, 1)}-01"
+            response = await run_storage_call(
+                lambda: query().or_(f"transaction_date.gte.{hot_from},transaction_date.is.null").execute(),
+                hedge=True,
+            )
+        rows = response.data or []
+        
+        if may_compact:
+            if response.count is None or len(rows) < response.count:
+                # Archiving a partial read would drop the missing rows for good
+                logger.warning(f"Skipping archive compaction for user {user_id}: read {len(rows)} of {response.count} transactions")
+            else:
+                closed = [row for row in rows if _is_closed(row, through)]
+                if closed:
+                    loop = asyncio.get_running_loop()
+                    loop.run_in_executor(None, _compact_archive, user_id_str, closed, through, generation)
+        
+        logger.info(f"Found {len(rows)} hot transactions and {len(segments)} archived months for user: {user_id}")
+        return rows, segments
+    except StorageUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting transactions for user {user_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
 async def update_entity(entity_id: int, entity: BaseModel, table_name: str) -> Dict[str, Any]:
     """Generic function to update an entity."""
+    submitted = previous = None
+    writing = False
     try:
         # Get data as dict and process it for Supabase
         raw_data = entity.model_dump()
         logger.info(f"Updating entity in {table_name}: {raw_data}")
         
         # Process data without modifying original
-        data = prepare_data_for_supabase(raw_data)
+        data = prepare_data_for_supabase(raw_data, money_fields(type(entity)))
         
-        response = supabase.table(table_name).update(data).eq("id", entity_id).execute()
+        # Listeners see the previous row too, which costs one read
+        previous = None
+        if _entity_listeners.get(table_name):
+            previous_response = await run_storage_call(lambda: supabase.table(table_name).select("*").eq("id", entity_id).execute())
+            previous = previous_response.data[0] if previous_response.data else None
+        
+        submitted = {**(previous or {}), **data}
+        _run_write_hooks(table_name, False, submitted, previous)
+        writing = True
+        response = await run_storage_call(lambda: supabase.table(table_name).update(data).eq("id", entity_id).execute())
         if not response.data:
             raise HTTPException(status_code=404, detail=f"Entity not found in {table_name}")
+        _notify_listeners(table_name, "update", response.data[0], previous)
         return response.data[0]
+    except StorageUnavailable as e:
+        if writing:
+            _notify_failed_write(table_name, e, submitted, previous)
+        raise
     except Exception as e:
+        if writing:
+            _notify_failed_write(table_name, e, submitted, previous)
         logger.error(f"Error updating entity in {table_name}: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if writing:
+            _run_write_hooks(table_name, True, submitted, previous)
 
 async def delete_entity(entity_id: int, table_name: str) -> Dict[str, Any]:
     """Generic function to delete an entity."""
+    previous = None
+    writing = False
     try:
-        response = supabase.table(table_name).delete().eq("id", entity_id).execute()
+        # Listeners need the row's owner even if the delete's outcome is unknown
+        if _entity_listeners.get(table_name):
+            previous_response = await run_storage_call(lambda: supabase.table(table_name).select("*").eq("id", entity_id).execute())
+            previous = previous_response.data[0] if previous_response.data else None
+        
+        _run_write_hooks(table_name, False, None, previous)
+        writing = True
+        response = await run_storage_call(lambda: supabase.table(table_name).delete().eq("id", entity_id).execute())
         if not response.data:
             raise HTTPException(status_code=404, detail=f"Entity not found in {table_name}")
+        _notify_listeners(table_name, "delete", None, response.data[0])
         return {"message": f"Entity deleted successfully from {table_name}"}
+    except StorageUnavailable as e:
+        if writing:
+            _notify_failed_write(table_name, e, None, previous)
+        raise
     except Exception as e:
+        if writing:
+            _notify_failed_write(table_name, e, None, previous)
         raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if writing:
+            _run_write_hooks(table_name, True, None, previous)
 
 async def get_user_by_email(email: str):
     """Get a user by email."""
     try:
-        response = supabase.table("users").select("*").eq("email", email).execute()
+        response = await run_storage_call(lambda: supabase.table("users").select("*").eq("email", email).execute(), hedge=True)
         return response.data[0] if response.data else None
+    except StorageUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error getting user by email: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -129,8 +318,10 @@ async def get_user_by_email(email: str):
 async def get_user_by_id(user_id: str):
     """Get a user by ID."""
     try:
-        response = supabase.table("users").select("*").eq("id", user_id).execute()
+        response = await run_storage_call(lambda: supabase.table("users").select("*").eq("id", user_id).execute(), hedge=True)
         return response.data[0] if response.data else None
+    except StorageUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error getting user by ID: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -138,8 +329,13 @@ async def get_user_by_id(user_id: str):
 async def create_user(user_data: dict):
     """Create a new user."""
     try:
-        response = supabase.table("users").insert(user_data).execute()
+        response = await run_storage_call(lambda: supabase.table("users").insert(user_data).execute())
         return response.data[0] if response.data else None
+    except StorageUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error creating user: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e)) 
+
+# Writes that touch archived months roll the archive back
+add_entity_listener("transactions", invalidate_archived_rows)
\ No newline at end of file
@@ -1,5 +1,10 @@
-from supabase import create_client
-from config import SUPABASE_URL, SUPABASE_KEY
+from supabase import create_client, ClientOptions
+from config import SUPABASE_URL, SUPABASE_KEY, STORAGE_CALL_TIMEOUT_SECONDS
 
-# Initialize Supabase client
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY) 
\ No newline at end of file
+# Initialize Supabase client; the PostgREST timeout bounds the worker thread
+# even after the caller has given up on the call
+supabase = create_client(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    options=ClientOptions(postgrest_client_timeout=STORAGE_CALL_TIMEOUT_SECONDS),
+)
\ No newline at end of file
@@ -0,0 +1,361 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+import httpx
+import requests
+from postgrest.exceptions import APIError
+from requests.adapters import HTTPAdapter
+
+from config import (
+    logger,
+    STORAGE_REQUEST_BUDGET_SECONDS,
+    STORAGE_CALL_TIMEOUT_SECONDS,
+    STORAGE_CONNECT_TIMEOUT_SECONDS,
+    STORAGE_HEDGE_MIN_DELAY_SECONDS,
+    STORAGE_POOL_SIZE,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+    STORAGE_MAX_CONCURRENCY,
+    STORAGE_MAX_QUEUE,
+)
+from utils.profiling import span, sampled_call
+
+# Absolute (monotonic) deadline for the request currently being served
+_request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+# Errors that indicate the backend itself is slow or unreachable
+TRANSIENT_ERRORS = (TimeoutError, OSError, httpx.TransportError, requests.RequestException)
+
+# SQLSTATE classes PostgREST answers with a 5xx (connection, resources,
+# operator intervention, system and internal errors, ...)
+SERVER_SQLSTATE_CLASSES = ("08", "09", "2D", "38", "39", "3B", "40", "53", "55", "57", "58", "F0", "HV", "XX")
+
+# Executor used for blocking storage calls; room for one hedge per admitted call
+executor = ThreadPoolExecutor(max_workers=STORAGE_MAX_CONCURRENCY * 2, thread_name_prefix="storage")
+
+
+class StorageUnavailable(Exception):
+    """Raised when a storage call cannot be served (breaker open or deadline hit)."""
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def start_request_budget(budget: float = STORAGE_REQUEST_BUDGET_SECONDS):
+    """Start the per-request budget; returns a token for reset_request_budget."""
+    return _request_deadline.set(time.monotonic() + budget)
+
+
+def reset_request_budget(token) -> None:
+    _request_deadline.reset(token)
+
+
+def storage_timeout() -> float:
+    """Per-call timeout: the call cap, shortened to what is left of the request budget."""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return STORAGE_CALL_TIMEOUT_SECONDS
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise StorageUnavailable("Request deadline exceeded", status_code=504)
+    return min(STORAGE_CALL_TIMEOUT_SECONDS, remaining)
+
+
+class LatencyTracker:
+    """Keeps a window of recent call latencies to derive the hedging delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 20:
+            return None
+        index = min(len(samples) - 1, int(len(samples) * pct / 100))
+        return samples[index]
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures, half-open after a cool-down."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            return self._state
+
+    def before_call(self) -> bool:
+        """
+        Raise StorageUnavailable if the call should fail fast. Returns True if
+        the call took the half-open trial slot, which the caller must settle
+        with record_success/record_failure or give back with cancel_probe.
+        """
+        state = self.state
+        with self._lock:
+            if state == self.OPEN:
+                retry_after = self.reset_seconds - (self._clock() - self._opened_at)
+                raise StorageUnavailable(f"{self.name} backend unavailable", retry_after=max(retry_after, 1))
+            if state == self.HALF_OPEN:
+                # Only one trial call goes through while half-open
+                if self._probe_in_flight:
+                    raise StorageUnavailable(f"{self.name} backend recovering", retry_after=1)
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def cancel_probe(self) -> None:
+        """Give up a half-open trial slot without recording an outcome."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed")
+            self._failures = 0
+            self._state = self.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit breaker '{self.name}' opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+
+
+class ConcurrencyGate:
+    """
+    Bounds in-flight storage calls. Callers beyond the limit wait in a queue of
+    bounded depth; once the queue is full new calls are shed immediately.
+    """
+
+    def __init__(self, limit: int = STORAGE_MAX_CONCURRENCY, max_queue: int = STORAGE_MAX_QUEUE):
+        self.limit = limit
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    async def acquire(self, timeout: float) -> None:
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise StorageUnavailable("Storage queue full", retry_after=1)
+        if not self._semaphore.locked():
+            # Uncontended: take the slot without scheduling a timeout task
+            await self._semaphore.acquire()
+            self.in_flight += 1
+            return
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise StorageUnavailable("Timed out waiting for a storage slot", status_code=504)
+        finally:
+            self.queued -= 1
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+storage_gate = ConcurrencyGate()
+supabase_breaker = CircuitBreaker("supabase")
+supabase_latency = LatencyTracker()
+
+
+def _hedge_delay(latency: LatencyTracker) -> Optional[float]:
+    p95 = latency.percentile(95)
+    if p95 is None:
+        return None
+    return max(p95, STORAGE_HEDGE_MIN_DELAY_SECONDS)
+
+
+async def run_storage_call(fn: Callable[[], Any], hedge: bool = False,
+                           breaker: CircuitBreaker = supabase_breaker,
+                           latency: LatencyTracker = supabase_latency) -> Any:
+    """
+    Run a blocking storage call off the event loop under the request deadline.
+
+    Reads can pass hedge=True: if the first attempt has not answered after the
+    recent p95 latency, a duplicate is issued and the first answer wins.
+    """
+    timeout = storage_timeout()
+    probe = breaker.before_call()
+    gate = storage_gate
+    try:
+        with span("storage_queue"):
+            await gate.acquire(timeout)
+        attempts = []
+        try:
+            with span("storage"):
+                return await _run_admitted(fn, hedge, breaker, latency, attempts)
+        finally:
+            _release_when_done(gate, attempts)
+    except BaseException:
+        # Shed, cancelled (client went away) or failed: never leave the
+        # half-open trial slot taken, or every later call is rejected
+        if probe:
+            breaker.cancel_probe()
+        raise
+
+
+def _release_when_done(gate: ConcurrencyGate, attempts: list) -> None:
+    """
+    Free the call's gate slot once every executor attempt has returned. A
+    caller that timed out or lost to its hedge leaves the blocking call
+    running, and that call still counts against the concurrency limit.
+    """
+    pending = [attempt for attempt in attempts if not attempt.done()]
+    if not pending:
+        gate.release()
+        return
+    remaining = [len(pending)]
+
+    def attempt_done(_):
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            gate.release()
+
+    for attempt in pending:
+        attempt.add_done_callback(attempt_done)
+
+
+async def _run_admitted(fn: Callable[[], Any], hedge: bool, breaker: CircuitBreaker, latency: LatencyTracker,
+                        attempts: list) -> Any:
+    # Waiting for a slot used up part of the call's budget
+    timeout = storage_timeout()
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    fn = sampled_call(fn)
+
+    attempts.append(loop.run_in_executor(executor, fn))
+    try:
+        delay = _hedge_delay(latency) if hedge else None
+        if delay is not None and delay < timeout:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done:
+                logger.info(f"Hedging slow storage call after {delay:.3f}s")
+                attempts.append(loop.run_in_executor(executor, fn))
+
+        remaining = timeout - (time.monotonic() - started)
+        result = await _first_success(attempts, remaining)
+    except asyncio.TimeoutError:
+        breaker.record_failure()
+        raise StorageUnavailable(f"Storage call timed out after {timeout:.2f}s", status_code=504)
+    except TRANSIENT_ERRORS:
+        breaker.record_failure()
+        raise
+    except Exception as e:
+        if is_server_error(e):
+            breaker.record_failure()
+        else:
+            # The backend answered, just not with what we wanted
+            breaker.record_success()
+        raise
+
+    latency.record(time.monotonic() - started)
+    breaker.record_success()
+    return result
+
+
+def is_server_error(error: BaseException) -> bool:
+    """
+    True if a PostgREST APIError stands for a 5xx response. Non-JSON error
+    bodies (e.g. a gateway 502) carry the HTTP status as the code; JSON ones
+    carry a PostgREST or SQLSTATE code, mapped the way PostgREST maps them.
+    """
+    if not isinstance(error, APIError):
+        return False
+    code = error.code
+    if code is None:
+        return False
+    if isinstance(code, int) or (isinstance(code, str) and code.isdigit() and len(code) == 3):
+        return int(code) >= 500
+    code = str(code)
+    if code.startswith("PGRST"):
+        # PGRST000-003: PostgREST could not reach or time out on the database
+        return code[5:8] in ("000", "001", "002", "003")
+    return code[:2] in SERVER_SQLSTATE_CLASSES
+
+
+async def _first_success(attempts, timeout: float) -> Any:
+    """Return the first attempt to succeed; raise the last error if all fail."""
+    pending = set(attempts)
+    error: Optional[BaseException] = None
+    deadline = time.monotonic() + timeout
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            raise asyncio.TimeoutError()
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def create_http_session(pool_size: int = STORAGE_POOL_SIZE) -> requests.Session:
+    """Keep-alive session with a connection pool sized for the storage executor."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def http_timeout(timeout: float):
+    """(connect, read) timeout tuple for requests, bounded by the call timeout."""
+    return (min(STORAGE_CONNECT_TIMEOUT_SECONDS, timeout), timeout)
@@ -4,11 +4,17 @@ from dotenv import load_dotenv
 from supabase import create_client, Client
 from fastapi import FastAPI, Request, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import asyncio
 from functools import lru_cache
-from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 
 import requests
+from config import COMPRESSION_MINIMUM_SIZE
+from utils.compression import CompressionMiddleware
+from auth.admin import is_admin_token
+from utils.profiling import start_profile, finish_profile, activate_profile, deactivate_profile
+from db.resilience import StorageUnavailable, start_request_budget, reset_request_budget
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,7 +24,6 @@ load_dotenv()
 
 # Initialize FastAPI app
 app = FastAPI(title="Financial Management API")
-executor = ThreadPoolExecutor()
 
 # Get allowed origins from environment or use default for local development
 #FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -38,14 +43,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (brotli when available, otherwise gzip)
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MINIMUM_SIZE)
+
+# Query parameters that carry credentials (?token= on live streams)
+REDACTED_QUERY_PARAMS = {"token"}
+
+def loggable_url(request: Request) -> str:
+    """Path and query string with credential values masked, for log lines."""
+    query = [
+        (key, "REDACTED" if key in REDACTED_QUERY_PARAMS else value)
+        for key, value in request.query_params.multi_items()
+    ]
+    return request.url.path + (f"?{urlencode(query)}" if query else "")
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
+    logger.info(f"Request: {request.method} {loggable_url(request)}")
     response = await call_next(request)
     logger.info(f"Response status: {response.status_code}")
     return response
 
+# Span breakdown for every request; stack sampling when asked for (X-Profile
+# carrying the admin token) or picked by PROFILE_SAMPLE_RATE. Slow requests
+# and sampled ones are kept for /api/admin/profiles.
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    profile = start_profile(
+        request.method,
+        request.url.path,
+        requested=is_admin_token(request.headers.get("x-profile")),
+    )
+    token = activate_profile(profile)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        deactivate_profile(token)
+        captured = finish_profile(profile, status_code)
+    if captured:
+        response.headers["X-Profile-Id"] = str(profile.id)
+    return response
+
+# Per-request budget that storage call deadlines are derived from
+@app.middleware("http")
+async def request_budget(request: Request, call_next):
+    token = start_request_budget()
+    try:
+        return await call_next(request)
+    finally:
+        reset_request_budget(token)
+
+# Fail fast when storage is degraded or the request ran out of time
+@app.exception_handler(StorageUnavailable)
+async def storage_unavailable_handler(request: Request, exc: StorageUnavailable):
+    logger.warning(f"Storage unavailable for {request.method} {loggable_url(request)}: {str(exc)}")
+    headers = {"Retry-After": str(int(exc.retry_after))} if exc.retry_after else None
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=headers)
+
 # Initialize Supabase client
 try:
     supabase_url = os.getenv("PYTHON_SUPABASE_URL")
@@ -63,33 +120,50 @@ except Exception as e:
 
 # Import JWT verification dependency
 from auth.dependencies import verify_token
+from utils.admission import client_rate_limit, user_rate_limit
 
 # Import routers
-from routers import assets, liabilities, transactions, investments, dashboard, users
+from routers import assets, liabilities, transactions, investments, dashboard, users, admin, live, budgets
 
-# Add users router without authentication
-app.include_router(users.router)
+# Add users router without authentication (rate limited per client address)
+app.include_router(
+    users.router,
+    dependencies=[Depends(client_rate_limit)]
+)
+
+# Operational endpoints guarded by the admin token
+app.include_router(admin.router)
 
 # Add all other routers with JWT authentication
 app.include_router(
     assets.router,
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(user_rate_limit)]
 )
 app.include_router(
     liabilities.router,
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(user_rate_limit)]
 )
 app.include_router(
     transactions.router,
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(user_rate_limit)]
 )
 app.include_router(
     investments.router,
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(user_rate_limit)]
 )
 app.include_router(
     dashboard.router,
-    dependencies=[Depends(verify_token)]
+    dependencies=[Depends(verify_token), Depends(user_rate_limit)]
+)
+app.include_router(
+    budgets.router,
+    dependencies=[Depends(verify_token), Depends(user_rate_limit)]
+)
+
+# Live updates authenticate inside the route (EventSource cannot send headers)
+app.include_router(
+    live.router,
+    dependencies=[Depends(client_rate_limit)]
 )
 
 # Root endpoint for health checks
@@ -1,12 +1,12 @@
-from pydantic import condecimal, field_validator, Field, BaseModel as PydanticBaseModel
-from models.base import PydanticUUID4, Optional
+from pydantic import field_validator, Field, BaseModel as PydanticBaseModel
+from models.base import PydanticUUID4, Optional, Money
 from datetime import date
 from typing import Any
 from decimal import Decimal
 class AssetBase(PydanticBaseModel):
     asset_type: str
     asset_name: Optional[str] = None
-    value: condecimal(max_digits=12, decimal_places=2)
+    value: Money
     acquired_date: Optional[date] = None
     
     class Config:
@@ -1,7 +1,28 @@
-from pydantic import BaseModel, condecimal, field_validator, UUID4
+from pydantic import BaseModel, field_validator, UUID4, PlainValidator, PlainSerializer, WithJsonSchema
 from datetime import datetime, date
-from typing import Optional
+from typing import Optional, Annotated, Tuple
+from functools import lru_cache
+from decimal import Decimal
 from uuid import UUID
+from utils.money import to_cents, cents_to_decimal
 
 # Rename the Pydantic UUID4 to avoid confusion
-PydanticUUID4 = UUID4 
\ No newline at end of file
+PydanticUUID4 = UUID4
+
+# Money is held as integer cents; the API accepts and emits decimal values.
+# to_cents does the whole validation so the Cents type survives model_dump()
+# round trips instead of being coerced back to a plain int and scaled again.
+Money = Annotated[
+    int,
+    PlainValidator(to_cents),
+    PlainSerializer(cents_to_decimal, return_type=Decimal, when_used="json"),
+    WithJsonSchema({"anyOf": [{"type": "number"}, {"type": "string", "pattern": r"^[+-]?\d*(\.\d{1,2})?$"}]}),
+]
+
+@lru_cache()
+def money_fields(model: type) -> Tuple[str, ...]:
+    """Names of the Money fields declared on a model."""
+    return tuple(
+        name for name, field in model.model_fields.items()
+        if any(isinstance(meta, PlainValidator) and meta.func is to_cents for meta in field.metadata)
+    )
\ No newline at end of file
@@ -0,0 +1,36 @@
+from typing import List
+from models.base import BaseModel, PydanticUUID4, Optional, Money
+
+class BudgetBase(BaseModel):
+    category_type: str
+    monthly_limit: Money
+
+class BudgetCreate(BudgetBase):
+    user_id: PydanticUUID4
+
+class Budget(BudgetBase):
+    id: int
+    user_id: PydanticUUID4
+
+class BudgetAlert(BaseModel):
+    category_type: str
+    month: str
+    threshold: int
+    direction: str
+    spent: Money
+    monthly_limit: Money
+
+class BudgetCategoryStatus(BaseModel):
+    category_type: str
+    monthly_limit: Money
+    spent: Money
+    remaining: Money
+    percent_used: float
+    thresholds_reached: List[int] = []
+
+class BudgetStatus(BaseModel):
+    user_id: PydanticUUID4
+    month: str
+    budgets: List[BudgetCategoryStatus] = []
+    unbudgeted_spent: Money = 0
+    recent_alerts: List[BudgetAlert] = []
\ No newline at end of file
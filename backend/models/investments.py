@@ -1,12 +1,12 @@
 from pydantic import condecimal, field_validator
-from models.base import BaseModel, PydanticUUID4, Optional, datetime
+from models.base import BaseModel, PydanticUUID4, Optional, datetime, Money
 
 class InvestmentBase(BaseModel):
     investment_type: str
     asset_name: str
     quantity: condecimal(max_digits=10, decimal_places=2)
-    purchase_price: condecimal(max_digits=12, decimal_places=2)
-    current_value: condecimal(max_digits=12, decimal_places=2)
+    purchase_price: Money
+    current_value: Money
     
     @field_validator("investment_type", mode="before")
     def validate_investment_type(cls, value):
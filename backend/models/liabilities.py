@@ -1,11 +1,11 @@
-from pydantic import condecimal, field_validator
-from models.base import BaseModel, PydanticUUID4, Optional
+from pydantic import field_validator
+from models.base import BaseModel, PydanticUUID4, Optional, Money
 from datetime import date  # Change from datetime to date
 
 class LiabilityBase(BaseModel):
     liability_type: str
     description: Optional[str] = None
-    amount: condecimal(max_digits=12, decimal_places=2)
+    amount: Money
     due_date: Optional[date] = None  # Use date instead of datetime
     
     @field_validator("liability_type", mode="before")
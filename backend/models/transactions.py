@@ -1,8 +1,8 @@
-from pydantic import condecimal, field_validator
-from models.base import BaseModel, PydanticUUID4, Optional, datetime
+from pydantic import field_validator
+from models.base import BaseModel, PydanticUUID4, Optional, datetime, Money
 
 class TransactionBase(BaseModel):
-    amount: condecimal(max_digits=12, decimal_places=2)
+    amount: Money
     category_type: str
     transaction_type: str
     location: str
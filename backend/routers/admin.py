@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from auth.admin import verify_admin
+from db.resilience import storage_gate, supabase_breaker
+from utils.admission import admission_stats
+from utils.profiling import profile_store
+from utils.live import live_hub
+from utils.budgets import budget_engine
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["admin"],
+    dependencies=[Depends(verify_admin)],
+)
+
+@router.get("/admission")
+async def get_admission_stats():
+    """Queue depth, in-flight storage calls and rejection counts."""
+    return {
+        "admission": admission_stats(),
+        "storage": storage_gate.stats(),
+        "breaker": supabase_breaker.state,
+        "live": live_hub.stats(),
+        "budgets": budget_engine.stats(),
+    }
+
+@router.get("/profiles")
+async def list_profiles():
+    """Captured request profiles, most recent first."""
+    return [profile.summary() for profile in profile_store.list()]
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: int):
+    """Span breakdown for one captured request."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.to_dict()
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse)
+async def get_profile_collapsed(profile_id: int):
+    """
+    Stack samples in collapsed format for flamegraph.pl or speedscope.
+    Stacks under "[storage thread: this request]" come from the executor
+    threads running this request's storage calls. Stacks under
+    "[event loop: whole worker]" are the event loop thread during the request
+    window, which includes other concurrent requests and idle polling.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile.collapsed()
\ No newline at end of file
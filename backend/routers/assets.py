@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, status
-from typing import List
+from typing import Optional
 from models.assets import Asset, AssetCreate, AssetBase
 from db.crud import create_entity, get_entity_by_id, get_entities_by_user, update_entity, delete_entity
+from utils.sparse import parse_fields, sparse_response, sparse_list_schema
 from datetime import date
 
 router = APIRouter(
@@ -19,9 +20,10 @@ async def get_asset(asset_id: int):
     asset = await get_entity_by_id(asset_id, "assets")
     return asset
 
-@router.get("/user/{user_id}", response_model=List[Asset])
-async def get_user_assets(user_id: str):
-    data = await get_entities_by_user(user_id, "assets")
+@router.get("/user/{user_id}", response_model=sparse_list_schema(Asset))
+async def get_user_assets(user_id: str, fields: Optional[str] = None):
+    columns = parse_fields(fields, Asset)
+    data = await get_entities_by_user(user_id, "assets", columns)
     
     # Process date fields
     for asset in data:
@@ -31,17 +33,14 @@ async def get_user_assets(user_id: str):
             except (ValueError, TypeError):
                 asset["acquired_date"] = None
     
+    if columns is not None:
+        return sparse_response(Asset, columns, data)
     return data
 
 @router.put("/{asset_id}", response_model=Asset)
 async def update_asset(asset_id: int, asset: AssetBase):
-    # Prepare asset for update
-    asset_dict = asset.model_dump()
-    if asset_dict.get("acquired_date"):
-        asset_dict["acquired_date"] = asset_dict["acquired_date"].isoformat()
-    asset_dict["value"] = float(asset_dict["value"])
-    
-    return await update_entity(asset_id, asset_dict, "assets")
+    # update_entity encodes the date and the cents value for storage
+    return await update_entity(asset_id, asset, "assets")
 
 @router.delete("/{asset_id}")
 async def delete_asset(asset_id: int):
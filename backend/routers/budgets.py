@@ -0,0 +1,104 @@
+from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, Optional, Tuple
+from datetime import datetime, timezone
+from collections import defaultdict
+from models.budgets import Budget, BudgetCreate, BudgetBase, BudgetAlert, BudgetStatus
+from db.crud import create_entity, get_entities_by_user, update_entity, delete_entity, get_transactions_with_archive, add_entity_listener, add_write_hooks
+from models.base import PydanticUUID4
+from config import logger
+from utils.budgets import budget_engine, expense_key
+from utils.money import storage_cents
+from utils.live import live_hub
+from utils.sparse import parse_fields, sparse_response, sparse_list_schema
+
+router = APIRouter(
+    prefix="/api/budgets",
+    tags=["budgets"]
+)
+
+# Only these columns are needed to recompute spend
+SPEND_COLUMNS = ["user_id", "amount", "transaction_type", "category_type", "transaction_date"]
+# A rebuild that keeps racing with writes gives up after this many reads
+MAX_REBUILD_ATTEMPTS = 3
+
+def _publish_alert(user_id: str, alert: Dict[str, Any]) -> None:
+    live_hub.publish(user_id, {"type": "budget_alert", **BudgetAlert(**alert).model_dump(mode="json")})
+
+add_entity_listener("transactions", budget_engine.apply_transaction)
+add_entity_listener("budgets", budget_engine.apply_budget)
+for table_name in ("transactions", "budgets"):
+    add_write_hooks(table_name, budget_engine.write_started, budget_engine.write_finished)
+budget_engine.on_alert(_publish_alert)
+
+async def rebuild_budgets(user_id: str) -> None:
+    """Recompute a user's limits and spend counters from their full history."""
+    for _ in range(MAX_REBUILD_ATTEMPTS):
+        generation = budget_engine.begin_rebuild(user_id)
+        try:
+            budgets = await get_entities_by_user(user_id, "budgets")
+            rows, segments = await get_transactions_with_archive(user_id, SPEND_COLUMNS)
+
+            spent: Dict[Tuple[str, str], int] = defaultdict(int)
+            for segment in segments:
+                # Archived months are already summarised per category
+                for category, cents in segment.summary()["categories"].items():
+                    spent[(segment.month, category or "uncategorized")] += cents
+            for row in rows:
+                key = expense_key(row)
+                if key is not None:
+                    _, month, category = key
+                    spent[(month, category)] += storage_cents(row.get("amount"))
+
+            if budget_engine.rebuild(user_id, generation, budgets, spent):
+                logger.info(f"Rebuilt budget counters for user {user_id} ({len(budgets)} budgets, {len(spent)} counters)")
+                return
+        finally:
+            budget_engine.end_rebuild(user_id)
+    logger.warning(f"Budget rebuild for user {user_id} kept racing with writes")
+    raise HTTPException(status_code=503, detail="Budget data is changing too quickly, try again")
+
+@router.post("/", response_model=Budget)
+async def create_budget(budget: BudgetCreate):
+    return await create_entity(budget, "budgets")
+
+@router.get("/user/{user_id}", response_model=sparse_list_schema(Budget))
+async def get_user_budgets(user_id: PydanticUUID4, fields: Optional[str] = None):
+    columns = parse_fields(fields, Budget)
+    data = await get_entities_by_user(str(user_id), "budgets", columns)
+    if columns is not None:
+        return sparse_response(Budget, columns, data)
+    return data
+
+@router.get("/{user_id}", response_model=BudgetStatus)
+async def get_budget_status(user_id: PydanticUUID4, month: Optional[str] = None):
+    """
+    Spend against each category budget for a month (default: the current UTC
+    month), served from the running counters. The first request for a user
+    loads the counters from history.
+    """
+    if month is None:
+        month = datetime.now(timezone.utc).strftime("%Y-%m")
+    else:
+        try:
+            month = datetime.strptime(month, "%Y-%m").strftime("%Y-%m")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="month must be YYYY-MM")
+    user_id_str = str(user_id)
+    if not budget_engine.is_loaded(user_id_str):
+        await rebuild_budgets(user_id_str)
+    return budget_engine.status(user_id_str, month)
+
+@router.post("/{user_id}/rebuild", response_model=BudgetStatus)
+async def rebuild_budget_status(user_id: PydanticUUID4):
+    """Discard the running counters and recompute them from history."""
+    user_id_str = str(user_id)
+    await rebuild_budgets(user_id_str)
+    return budget_engine.status(user_id_str, datetime.now(timezone.utc).strftime("%Y-%m"))
+
+@router.put("/{budget_id}", response_model=Budget)
+async def update_budget(budget_id: int, budget: BudgetBase):
+    return await update_entity(budget_id, budget, "budgets")
+
+@router.delete("/{budget_id}")
+async def delete_budget(budget_id: int):
+    return await delete_entity(budget_id, "budgets")
\ No newline at end of file
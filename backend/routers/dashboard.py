@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
+import asyncio
+from fastapi import APIRouter, HTTPException, Response
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 from uuid import UUID
 from collections import defaultdict
 from db.database import supabase
+from db.resilience import run_storage_call, StorageUnavailable
+from db.crud import get_transactions_with_archive
+from db.archive import ArchiveSegment
 from config import logger
+from utils.profiling import span
+from utils.money import storage_cents, cents_to_float
 
 # Define the router
 router = APIRouter(
@@ -22,6 +28,137 @@ class DashboardData(BaseModel):
     monthlyData: List[Dict[str, Any]] = []
     expenseCategories: List[Dict[str, Any]] = []
 
+def _transaction_month(date_str: Any):
+    """Return (sort key, display name) for a transaction date, or None if it has none."""
+    # Skip if no date
+    if not date_str or not isinstance(date_str, str):
+        return None
+    # Handle different date formats
+    if 'T' in date_str:
+        date_str = date_str.split('T')[0]
+    transaction_date = datetime.strptime(date_str, "%Y-%m-%d")
+    return transaction_date.strftime("%Y-%m"), transaction_date.strftime("%b %Y")
+
+def build_dashboard_data(transactions: List[Dict[str, Any]], assets: List[Dict[str, Any]],
+                         liabilities: List[Dict[str, Any]], archived: List[ArchiveSegment] = ()) -> Dict[str, Any]:
+    """
+    Aggregate a user's rows into the dashboard summary.
+    Archived months contribute their column summaries instead of rows.
+    All sums are exact integer cents, converted to decimal numbers at the end.
+    """
+    total_income = 0
+    total_expenses = 0
+    monthly_totals = defaultdict(lambda: {"month": "", "income": 0, "expense": 0})
+    expense_categories = defaultdict(int)
+    
+    # Single pass over the transactions for totals, months and categories
+    for transaction in transactions:
+        transaction_type = transaction.get("transaction_type")
+        amount = storage_cents(transaction.get("amount", 0))
+        
+        if transaction_type == "income":
+            total_income += amount
+        elif transaction_type == "expense":
+            total_expenses += amount
+            expense_categories[transaction.get("category_type", "uncategorized")] += amount
+        
+        try:
+            month = _transaction_month(transaction.get("transaction_date"))
+        except Exception as e:
+            logger.warning(f"Error processing transaction date: {e}")
+            continue
+        if month is None:
+            continue
+        
+        month_key, month_name = month
+        monthly_totals[month_key]["month"] = month_name
+        if transaction_type == "income":
+            monthly_totals[month_key]["income"] += amount
+        elif transaction_type == "expense":
+            monthly_totals[month_key]["expense"] += amount
+    
+    # Each archived segment is exactly one closed month
+    for segment in archived:
+        summary = segment.summary()
+        total_income += summary["income"]
+        total_expenses += summary["expense"]
+        monthly_totals[segment.month]["month"] = datetime.strptime(segment.month, "%Y-%m").strftime("%b %Y")
+        monthly_totals[segment.month]["income"] += summary["income"]
+        monthly_totals[segment.month]["expense"] += summary["expense"]
+        for category, amount in summary["categories"].items():
+            expense_categories[category] += amount
+    
+    # Calculate net worth (assets - liabilities)
+    total_assets = sum(storage_cents(a.get("value", 0)) for a in assets)
+    total_liabilities = sum(storage_cents(l.get("amount", 0)) for l in liabilities)
+    net_worth = total_assets - total_liabilities
+    
+    # Last 6 months, most recent first ("YYYY-MM" keys sort chronologically)
+    monthly_data = [
+        {
+            "month": monthly_totals[key]["month"],
+            "income": cents_to_float(monthly_totals[key]["income"]),
+            "expense": cents_to_float(monthly_totals[key]["expense"]),
+        }
+        for key in sorted(monthly_totals, reverse=True)[:6]
+    ]
+    
+    # Expense categories sorted by amount (highest first)
+    expense_categories_list = [
+        {"category": category, "amount": cents_to_float(amount)}
+        for category, amount in sorted(expense_categories.items(), key=lambda item: item[1], reverse=True)
+    ]
+    
+    return {
+        "totalIncome": cents_to_float(total_income),
+        "totalExpenses": cents_to_float(total_expenses),
+        "netWorth": cents_to_float(net_worth),
+        "monthlyData": monthly_data,
+        "expenseCategories": expense_categories_list
+    }
+
+def dashboard_delta(table_name: str, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Change to the dashboard summary caused by one write, so connected clients
+    can patch their copy instead of refetching: the new row counts positively
+    and the previous row negatively.
+    """
+    totals = defaultdict(int)
+    months = defaultdict(lambda: {"month": "", "income": 0, "expense": 0})
+    categories = defaultdict(int)
+    
+    for row, sign in ((new_row, 1), (old_row, -1)):
+        if not row:
+            continue
+        if table_name == "assets":
+            totals["netWorth"] += sign * storage_cents(row.get("value", 0))
+        elif table_name == "liabilities":
+            totals["netWorth"] -= sign * storage_cents(row.get("amount", 0))
+        elif table_name == "transactions":
+            transaction_type = row.get("transaction_type")
+            if transaction_type not in ("income", "expense"):
+                continue
+            amount = sign * storage_cents(row.get("amount", 0))
+            totals["totalIncome" if transaction_type == "income" else "totalExpenses"] += amount
+            if transaction_type == "expense":
+                categories[row.get("category_type", "uncategorized")] += amount
+            try:
+                month = _transaction_month(row.get("transaction_date"))
+            except Exception:
+                month = None
+            if month is not None:
+                months[month[0]]["month"] = month[1]
+                months[month[0]][transaction_type] += amount
+    
+    return {
+        **{key: cents_to_float(value) for key, value in totals.items() if value},
+        "monthlyData": {
+            key: {**value, "income": cents_to_float(value["income"]), "expense": cents_to_float(value["expense"])}
+            for key, value in months.items()
+        },
+        "expenseCategories": {category: cents_to_float(amount) for category, amount in categories.items() if amount},
+    }
+
 @router.get("/{user_id}", response_model=DashboardData)
 async def get_dashboard_data(user_id: str):
     try:
@@ -38,110 +175,26 @@ async def get_dashboard_data(user_id: str):
             logger.error(f"Invalid UUID format: {user_id}")
             raise HTTPException(status_code=400, detail="Invalid user ID format")
         
-        # Get all transactions for the user
-        transactions_response = supabase.table("transactions").select("*").eq("user_id", user_id_str).execute()
-        transactions = transactions_response.data if transactions_response.data else []
-        
-        # Get all assets for the user
-        assets_response = supabase.table("assets").select("*").eq("user_id", user_id_str).execute()
+        # Get transactions, assets and liabilities for the user concurrently
+        (transactions, archived), assets_response, liabilities_response = await asyncio.gather(
+            get_transactions_with_archive(user_id_str),
+            run_storage_call(lambda: supabase.table("assets").select("*").eq("user_id", user_id_str).execute(), hedge=True),
+            run_storage_call(lambda: supabase.table("liabilities").select("*").eq("user_id", user_id_str).execute(), hedge=True),
+        )
         assets = assets_response.data if assets_response.data else []
-        
-        # Get all liabilities for the user
-        liabilities_response = supabase.table("liabilities").select("*").eq("user_id", user_id_str).execute()
         liabilities = liabilities_response.data if liabilities_response.data else []
         
-        # Calculate total income and expenses
-        total_income = sum(float(t.get("amount", 0)) for t in transactions if t.get("transaction_type") == "income")
-        total_expenses = sum(float(t.get("amount", 0)) for t in transactions if t.get("transaction_type") == "expense")
-        
-        # Calculate net worth (assets - liabilities)
-        total_assets = sum(float(a.get("value", 0)) for a in assets)
-        total_liabilities = sum(float(l.get("amount", 0)) for l in liabilities)
-        net_worth = total_assets - total_liabilities
-        
-        # Calculate monthly data (last 6 months)
-        monthly_data = []
-        
-        # Create a dictionary to store monthly totals
-        monthly_totals = defaultdict(lambda: {"month": "", "income": 0, "expense": 0})
-        
-        # Process each transaction
-        for transaction in transactions:
-            try:
-                # Get the transaction date
-                date_str = transaction.get("transaction_date")
-                
-                # Skip if no date
-                if not date_str:
-                    continue
-                
-                # Convert string date to datetime
-                if isinstance(date_str, str):
-                    # Handle different date formats
-                    if 'T' in date_str:
-                        date_str = date_str.split('T')[0]
-                    transaction_date = datetime.strptime(date_str, "%Y-%m-%d")
-                else:
-                    continue
-                
-                # Format month name
-                month_key = transaction_date.strftime("%Y-%m")
-                month_name = transaction_date.strftime("%b %Y")
-                
-                # Update monthly totals
-                monthly_totals[month_key]["month"] = month_name
-                amount = float(transaction.get("amount", 0))
-                
-                if transaction.get("transaction_type") == "income":
-                    monthly_totals[month_key]["income"] += amount
-                elif transaction.get("transaction_type") == "expense":
-                    monthly_totals[month_key]["expense"] += amount
-                
-            except Exception as e:
-                logger.warning(f"Error processing transaction date: {e}")
-                continue
-        
-        # Convert to list and sort by date (most recent first)
-        monthly_data = list(monthly_totals.values())
+        with span("aggregation"):
+            dashboard_data = build_dashboard_data(transactions, assets, liabilities, archived)
         
-        # Sort monthly data
-        try:
-            monthly_data.sort(key=lambda x: datetime.strptime(x["month"], "%b %Y"), reverse=True)
-        except Exception as e:
-            logger.warning(f"Error sorting monthly data: {e}")
-        
-        # Limit to last 6 months
-        monthly_data = monthly_data[:6]
-        
-        # Calculate expense categories
-        expense_categories = defaultdict(float)
-        for transaction in transactions:
-            if transaction.get("transaction_type") == "expense":
-                category = transaction.get("category_type", "uncategorized")
-                amount = float(transaction.get("amount", 0))
-                expense_categories[category] += amount
-        
-        # Convert to list of dictionaries
-        expense_categories_list = [
-            {"category": category, "amount": amount}
-            for category, amount in expense_categories.items()
-        ]
-        
-        # Sort by amount (highest first)
-        expense_categories_list.sort(key=lambda x: x["amount"], reverse=True)
-        
-        # Create dashboard data
-        dashboard_data = {
-            "totalIncome": total_income,
-            "totalExpenses": total_expenses,
-            "netWorth": net_worth,
-            "monthlyData": monthly_data,
-            "expenseCategories": expense_categories_list
-        }
+        with span("serialization"):
+            body = DashboardData(**dashboard_data).model_dump_json()
         
         logger.info(f"Dashboard data generated successfully for user: {user_id}")
-        return dashboard_data
+        return Response(content=body, media_type="application/json")
         
+    except StorageUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error generating dashboard data for user {user_id}: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
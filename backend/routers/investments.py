@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
-from typing import List
+from typing import Optional
 from models.investments import Investment, InvestmentCreate, InvestmentBase
 from db.crud import create_entity, get_entity_by_id, get_entities_by_user, update_entity, delete_entity
 from models.base import PydanticUUID4
+from utils.sparse import parse_fields, sparse_response, sparse_list_schema
 
 router = APIRouter(
     prefix="/api/investments",
@@ -17,9 +18,13 @@ async def create_investment(investment: InvestmentCreate):
 async def get_investment(investment_id: int):
     return await get_entity_by_id(investment_id, "investment_portfolio")
 
-@router.get("/user/{user_id}", response_model=List[Investment])
-async def get_user_investments(user_id: PydanticUUID4):
-    return await get_entities_by_user(str(user_id), "investment_portfolio")
+@router.get("/user/{user_id}", response_model=sparse_list_schema(Investment))
+async def get_user_investments(user_id: PydanticUUID4, fields: Optional[str] = None):
+    columns = parse_fields(fields, Investment)
+    data = await get_entities_by_user(str(user_id), "investment_portfolio", columns)
+    if columns is not None:
+        return sparse_response(Investment, columns, data)
+    return data
 
 @router.put("/{investment_id}", response_model=Investment)
 async def update_investment(investment_id: int, investment: InvestmentBase):
@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
-from typing import List
+from typing import Optional
 from models.liabilities import Liability, LiabilityCreate, LiabilityBase
 from db.crud import create_entity, get_entity_by_id, get_entities_by_user, update_entity, delete_entity
 from models.base import PydanticUUID4
+from utils.sparse import parse_fields, sparse_response, sparse_list_schema
 
 router = APIRouter(
     prefix="/api/liabilities",
@@ -17,9 +18,13 @@ async def create_liability(liability: LiabilityCreate):
 async def get_liability(liability_id: int):
     return await get_entity_by_id(liability_id, "liabilities")
 
-@router.get("/user/{user_id}", response_model=List[Liability])
-async def get_user_liabilities(user_id: PydanticUUID4):
-    return await get_entities_by_user(str(user_id), "liabilities")
+@router.get("/user/{user_id}", response_model=sparse_list_schema(Liability))
+async def get_user_liabilities(user_id: PydanticUUID4, fields: Optional[str] = None):
+    columns = parse_fields(fields, Liability)
+    data = await get_entities_by_user(str(user_id), "liabilities", columns)
+    if columns is not None:
+        return sparse_response(Liability, columns, data)
+    return data
 
 @router.put("/{liability_id}", response_model=Liability)
 async def update_liability(liability_id: int, liability: LiabilityBase):
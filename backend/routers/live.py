@@ -0,0 +1,82 @@
+import asyncio
+import json
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from auth.dependencies import verify_stream_token, verify_token
+from auth.tokens import generate_stream_token, STREAM_TOKEN_EXPIRATION_SECONDS
+from config import logger, LIVE_HEARTBEAT_SECONDS
+from db.crud import add_entity_listener
+from routers.dashboard import dashboard_delta
+from utils.live import live_hub, Subscription
+
+router = APIRouter(
+    prefix="/api/live",
+    tags=["live"]
+)
+
+LIVE_TABLES = ("transactions", "assets", "liabilities")
+
+def format_event(event_type: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _publish_change(table_name: str):
+    def listener(action: str, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+        row = new_row or old_row
+        if not row or not row.get("user_id"):
+            return
+        live_hub.publish(str(row["user_id"]), {
+            "type": "delta",
+            "table": table_name,
+            "action": action,
+            "row": new_row,
+            "id": row.get("id"),
+            "dashboard": dashboard_delta(table_name, new_row, old_row),
+        })
+    return listener
+
+for table in LIVE_TABLES:
+    add_entity_listener(table, _publish_change(table))
+
+async def event_stream(request: Request, subscription: Subscription):
+    try:
+        yield "retry: 5000\n\n" + format_event("ready", {"type": "ready"})
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                # Comment line keeps proxies from timing out idle connections
+                yield ": ping\n\n"
+                continue
+            yield format_event(event["type"], event)
+            if event["type"] == "close":
+                break
+    finally:
+        live_hub.unsubscribe(subscription)
+        logger.info(f"Live stream closed for user {subscription.user_id}")
+
+@router.post("/token")
+async def create_stream_token(user_id: str = Depends(verify_token)):
+    """Short-lived token for ?token= on the stream endpoint (EventSource cannot send headers)."""
+    return {"token": generate_stream_token(user_id), "expires_in": STREAM_TOKEN_EXPIRATION_SECONDS}
+
+@router.get("/dashboard/{user_id}")
+async def stream_dashboard_updates(request: Request, user_id: str, token_user_id: str = Depends(verify_stream_token)):
+    """
+    Server-Sent Events stream of changes to the user's transactions, assets and
+    liabilities. Each "delta" event carries the changed row and the matching
+    change to the dashboard summary; "resync" means refetch the dashboard.
+    """
+    if str(token_user_id) != str(user_id):
+        raise HTTPException(status_code=403, detail="Cannot subscribe to another user's updates")
+    subscription = live_hub.subscribe(user_id)
+    logger.info(f"Live stream opened for user {user_id}")
+    return StreamingResponse(
+        event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
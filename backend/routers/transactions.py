@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
-from typing import List
+from typing import Optional
 from models.transactions import Transaction, TransactionCreate, TransactionBase
-from db.crud import create_entity, get_entity_by_id, get_entities_by_user, update_entity, delete_entity
+from db.crud import create_entity, get_entity_by_id, get_transactions_with_archive, update_entity, delete_entity
 from models.base import PydanticUUID4
+from utils.sparse import parse_fields, sparse_response, sparse_list_schema
 
 router = APIRouter(
     prefix="/api/transactions",
@@ -17,9 +18,15 @@ async def create_transaction(transaction: TransactionCreate):
 async def get_transaction(transaction_id: int):
     return await get_entity_by_id(transaction_id, "transactions")
 
-@router.get("/user/{user_id}", response_model=List[Transaction])
-async def get_user_transactions(user_id: PydanticUUID4):
-    return await get_entities_by_user(str(user_id), "transactions")
+@router.get("/user/{user_id}", response_model=sparse_list_schema(Transaction))
+async def get_user_transactions(user_id: PydanticUUID4, fields: Optional[str] = None):
+    columns = parse_fields(fields, Transaction)
+    data, archived = await get_transactions_with_archive(str(user_id), columns)
+    for segment in archived:
+        data.extend(segment.materialize(columns))
+    if columns is not None:
+        return sparse_response(Transaction, columns, data)
+    return data
 
 @router.put("/{transaction_id}", response_model=Transaction)
 async def update_transaction(transaction_id: int, transaction: TransactionBase):
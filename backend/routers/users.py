@@ -1,13 +1,14 @@
 import os
-import requests
-import asyncio
 import logging
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException
 from functools import lru_cache, partial
-from concurrent.futures import ThreadPoolExecutor
 from supabase import create_client, Client
 from auth.tokens import generate_jwt_token, generate_refresh_token
+from db.resilience import (
+    CircuitBreaker, LatencyTracker, StorageUnavailable,
+    create_http_session, http_timeout, run_storage_call, storage_timeout,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,8 +22,10 @@ if not SUPABASE_URL or not SERVICE_ROLE_KEY:
     logger.error("Missing Supabase URL or service role key")
     raise ValueError("Supabase configuration missing")
 
-# Initialize a global ThreadPoolExecutor
-executor = ThreadPoolExecutor()
+# Pooled keep-alive session and breaker for the Supabase auth admin API
+http_session = create_http_session()
+auth_breaker = CircuitBreaker("supabase-auth")
+auth_latency = LatencyTracker()
 
 router = APIRouter(
     prefix="/users",
@@ -34,14 +37,17 @@ def get_supabase_client() -> Client:
     # Create and cache the Supabase client using the service role key
     return create_client(SUPABASE_URL, SERVICE_ROLE_KEY)
 
-def fetch_user_by_id(user_id: str) -> dict:
+def fetch_user_by_id(user_id: str, timeout: float) -> dict:
     # Construct the URL and headers only once using module-level variables
     url = f"{SUPABASE_URL}/auth/v1/admin/users/{user_id}"
     headers = {
         "apikey": SERVICE_ROLE_KEY,
         "Authorization": f"Bearer {SERVICE_ROLE_KEY}",
     }
-    response = requests.get(url, headers=headers)
+    response = http_session.get(url, headers=headers, timeout=http_timeout(timeout))
+    if response.status_code >= 500:
+        # Server-side failures count against the circuit breaker
+        response.raise_for_status()
     if response.status_code != 200:
         logger.error(f"Error fetching user {user_id}: {response.text}")
         raise Exception(f"Error fetching user: {response.text}")
@@ -49,10 +55,14 @@ def fetch_user_by_id(user_id: str) -> dict:
 
 @router.get("/{user_id}")
 async def get_user_aud(user_id: str):
-    loop = asyncio.get_running_loop()
     try:
-        # Use functools.partial to pass user_id into fetch_user_by_id
-        user = await loop.run_in_executor(executor, partial(fetch_user_by_id, user_id))
+        # Use functools.partial to pass user_id and the call deadline into fetch_user_by_id
+        user = await run_storage_call(
+            partial(fetch_user_by_id, user_id, storage_timeout()),
+            hedge=True,
+            breaker=auth_breaker,
+            latency=auth_latency,
+        )
         # Extract only the "aud" field from the user object
         aud = user.get("aud")
         if aud is None:
@@ -74,6 +84,8 @@ async def get_user_aud(user_id: str):
         
         logger.info(f"Successfully retrieved aud for user {user_id}")
         return {"aud": aud}
+    except StorageUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving 'aud' for user {user_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve user: {str(e)}")
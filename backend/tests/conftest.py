@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The app reads its settings at import time; point it at a stand-in project
+os.environ.setdefault("PYTHON_SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("PYTHON_SUPABASE_ANON_KEY", "test.anon.key")
+os.environ.setdefault("PYTHON_SUPABASE_SERVICE_ROLE_KEY", "test-service-role-key")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
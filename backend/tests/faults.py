@@ -0,0 +1,126 @@
+import threading
+import time
+from typing import Any, List, Optional
+
+
+class FaultyBackend:
+    """
+    Local stand-in for a storage call. Each call consumes the next scripted
+    behaviour: a delay in seconds, an exception to raise, or both; once the
+    script runs out every call succeeds immediately.
+    """
+
+    def __init__(self, script: Optional[List[Any]] = None, result: Any = "ok"):
+        self.script = list(script or [])
+        self.result = result
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self) -> Any:
+        with self._lock:
+            self.calls += 1
+            step = self.script.pop(0) if self.script else None
+        delay, error = step if isinstance(step, tuple) else (step, None)
+        if isinstance(delay, BaseException):
+            delay, error = None, delay
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            raise error
+        return self.result
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, data: List[dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class FakeSupabase:
+    """
+    In-memory stand-in for the Supabase client's table queries. `max_rows`
+    truncates reads the way PostgREST's max-rows setting does; a write with
+    `write_error` set is applied and then fails, like a response lost after
+    the commit.
+    """
+
+    def __init__(self, tables: Optional[dict] = None, max_rows: Optional[int] = None):
+        self.tables = {name: [dict(row) for row in rows] for name, rows in (tables or {}).items()}
+        self.max_rows = max_rows
+        self.write_error: Optional[BaseException] = None
+        self.writes = 0
+
+    def table(self, name: str) -> "FakeQuery":
+        return FakeQuery(self, self.tables.setdefault(name, []))
+
+
+class FakeQuery:
+    def __init__(self, db: FakeSupabase, rows: List[dict]):
+        self.db = db
+        self.rows = rows
+        self.action = "select"
+        self.payload: Optional[dict] = None
+        self.count = None
+        self.filters: List[Any] = []
+
+    def select(self, *columns: str, count: Optional[str] = None) -> "FakeQuery":
+        self.count = count
+        return self
+
+    def insert(self, data: dict) -> "FakeQuery":
+        self.action, self.payload = "insert", data
+        return self
+
+    def update(self, data: dict) -> "FakeQuery":
+        self.action, self.payload = "update", data
+        return self
+
+    def delete(self) -> "FakeQuery":
+        self.action = "delete"
+        return self
+
+    def eq(self, column: str, value: Any) -> "FakeQuery":
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def or_(self, filters: str) -> "FakeQuery":
+        # Only the "column.gte.value" and "column.is.null" forms
+        tests = []
+        for condition in filters.split(","):
+            column, operator, value = condition.split(".", 2)
+            if operator == "is" and value == "null":
+                tests.append(lambda row, column=column: row.get(column) is None)
+            elif operator == "gte":
+                tests.append(lambda row, column=column, value=value: row.get(column) is not None and str(row[column]) >= value)
+            else:
+                raise ValueError(f"Unsupported filter: {condition}")
+        self.filters.append(lambda row: any(test(row) for test in tests))
+        return self
+
+    def execute(self) -> FakeResponse:
+        matching = [row for row in self.rows if all(test(row) for test in self.filters)]
+        if self.action == "select":
+            data = matching[:self.db.max_rows] if self.db.max_rows is not None else matching
+            return FakeResponse([dict(row) for row in data], len(matching) if self.count else None)
+
+        self.db.writes += 1
+        if self.action == "insert":
+            matching = [dict(self.payload, id=max((row["id"] for row in self.rows), default=0) + 1)]
+            self.rows.append(matching[0])
+        elif self.action == "update":
+            for row in matching:
+                row.update(self.payload)
+        else:
+            self.rows[:] = [row for row in self.rows if row not in matching]
+        error, self.db.write_error = self.db.write_error, None
+        if error is not None:
+            raise error
+        return FakeResponse([dict(row) for row in matching])
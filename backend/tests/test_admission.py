@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from tests.faults import FakeClock
+from utils import admission
+from utils.admission import KeyedRateLimiter, TokenBucket
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.retry_after() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.try_acquire()
+
+
+def test_global_rejection_does_not_spend_user_tokens(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission, "global_bucket", TokenBucket(rate=1, burst=1, clock=clock))
+    monkeypatch.setattr(admission, "user_limiter", KeyedRateLimiter(rate=1, burst=3))
+    admission.global_bucket.try_acquire()
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as exc:
+            asyncio.run(admission.user_rate_limit("user-1"))
+        assert exc.value.status_code == 429
+        assert exc.value.headers["Retry-After"] == "1"
+    assert admission.user_limiter.bucket("user-1").available() == pytest.approx(3, abs=0.1)
+
+
+def _request(host, forwarded=None):
+    from starlette.requests import Request
+
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "GET", "path": "/users/x", "headers": headers, "client": (host, 1234)})
+
+
+def test_one_client_cannot_exhaust_others(monkeypatch):
+    monkeypatch.setattr(admission, "global_bucket", TokenBucket(rate=1, burst=100))
+    monkeypatch.setattr(admission, "client_limiter", KeyedRateLimiter(rate=1, burst=2))
+
+    for _ in range(2):
+        asyncio.run(admission.client_rate_limit(_request("10.0.0.1")))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(admission.client_rate_limit(_request("10.0.0.1")))
+    assert exc.value.status_code == 429
+    asyncio.run(admission.client_rate_limit(_request("10.0.0.2")))
+
+
+def test_client_address_trusts_only_proxy_appended_entries(monkeypatch):
+    assert admission.client_address(_request("10.0.0.9", "1.2.3.4")) == "10.0.0.9"
+    monkeypatch.setattr(admission, "RATE_LIMIT_TRUSTED_PROXY_HOPS", 1)
+    assert admission.client_address(_request("10.0.0.9", "6.6.6.6, 1.2.3.4")) == "1.2.3.4"
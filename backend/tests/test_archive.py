@@ -0,0 +1,108 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from db import archive, crud, resilience
+from db.archive import TransactionArchive, current_cutoff, shift_month, transaction_month
+from db.resilience import ConcurrencyGate
+from tests.faults import FakeSupabase
+
+USER = "6f1c2b8e-5d3a-4c7e-9a1b-2c3d4e5f6a7b"
+
+
+def row(id, date, amount="10.00", category="food", type="expense"):
+    return {
+        "id": id, "user_id": USER, "amount": amount, "category_type": category,
+        "transaction_type": type, "location": "here", "description": f"row {id}",
+        "is_recurring": False, "transaction_date": date,
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TransactionArchive(str(tmp_path))
+
+
+def test_segment_round_trip_is_exact(store):
+    dates = [
+        "2024-01-05T10:00:00.123456+05:30",
+        "2024-01-06T10:00:00.500000",
+        "2024-01-31T23:59:59.999999+00:00",
+    ]
+    rows = [row(i, date) for i, date in enumerate(dates, 1)]
+    assert store.compact(USER, rows, "2024-01", 0)
+    _, segments, _ = store.snapshot(USER)
+    assert [r["transaction_date"] for r in segments[0].materialize()] == dates
+    assert segments[0].materialize(["id", "amount"])[0] == {"id": 1, "amount": "10.00"}
+
+
+def test_rows_are_filed_under_their_utc_month():
+    assert transaction_month("2024-01-31T23:00:00-05:00") == "2024-02"
+    assert transaction_month("2024-02-01T01:00:00+05:30") == "2024-01"
+    assert transaction_month("2024-01-31T23:00:00") == "2024-01"
+    assert transaction_month("2024-01-31T23:00:00+00:00") == "2024-01"
+
+
+def test_evicted_segment_stays_readable(store):
+    assert store.compact(USER, [row(1, "2024-01-05T00:00:00+00:00"), row(2, "2024-02-05T00:00:00+00:00")], "2024-02", 0)
+    _, segments, _ = store.snapshot(USER)
+
+    store.invalidate(USER, "2024-01")
+
+    assert segments[0].summary()["categories"] == {"food": 1000}
+    assert segments[1].materialize(["id"]) == [{"id": 2}]
+    assert not any(name.endswith(".seg") for name in os.listdir(store._user_dir(USER)))
+    assert store.snapshot(USER)[:2] == ("2023-12", [])
+
+
+def test_archive_survives_reload(store, tmp_path):
+    assert store.compact(USER, [row(1, "2024-01-05T00:00:00+00:00")], "2024-03", 0)
+    watermark, segments, _ = TransactionArchive(str(tmp_path)).snapshot(USER)
+    assert watermark == "2024-03"
+    assert [segment.month for segment in segments] == ["2024-01"]
+
+
+def test_compaction_writes_outside_the_lock(store, monkeypatch):
+    writing, release = threading.Event(), threading.Event()
+    write_segment = archive.write_segment
+
+    def slow_write(*args):
+        writing.set()
+        release.wait(5)
+        write_segment(*args)
+
+    monkeypatch.setattr(archive, "write_segment", slow_write)
+    worker = threading.Thread(target=store.compact, args=(USER, [row(1, "2024-01-05T00:00:00+00:00")], "2024-01", 0))
+    worker.start()
+    assert writing.wait(5)
+
+    # Readers and writers on the event loop are not blocked meanwhile
+    assert store.snapshot(USER)[0] is None
+    store.invalidate(USER, "2024-01")
+
+    release.set()
+    worker.join()
+    # The history changed during the write, so the result is discarded
+    assert store.snapshot(USER)[:2] == (None, [])
+    assert not any(name.endswith(".seg") for name in os.listdir(store._user_dir(USER)))
+
+
+def test_truncated_read_is_not_compacted(store, monkeypatch):
+    monkeypatch.setattr(resilience, "storage_gate", ConcurrencyGate(limit=4, max_queue=4))
+    db = FakeSupabase({"transactions": [row(i, f"2023-0{i}-05T00:00:00+00:00") for i in range(1, 4)]}, max_rows=2)
+    monkeypatch.setattr(crud, "supabase", db)
+    monkeypatch.setattr(crud, "transaction_archive", store)
+
+    # asyncio.run() waits for the background compaction before returning
+    rows, segments = asyncio.run(crud.get_transactions_with_archive(USER))
+    assert len(rows) == 2 and segments == []
+    assert store.snapshot(USER)[:2] == (None, [])
+
+    db.max_rows = None
+    rows, _ = asyncio.run(crud.get_transactions_with_archive(USER))
+    assert len(rows) == 3
+    watermark, segments, _ = store.snapshot(USER)
+    assert watermark == shift_month(current_cutoff(), -1)
+    assert [segment.month for segment in segments] == ["2023-01", "2023-02", "2023-03"]
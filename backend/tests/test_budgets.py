@@ -0,0 +1,162 @@
+import asyncio
+from collections import defaultdict
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from postgrest.exceptions import APIError
+
+from db import crud, resilience
+from db.resilience import ConcurrencyGate
+from models.transactions import TransactionCreate
+from tests.faults import FakeSupabase
+from utils.budgets import BudgetEngine
+
+USER = "6f1c2b8e-5d3a-4c7e-9a1b-2c3d4e5f6a7b"
+
+
+def expense(amount, category="food", date="2026-10-03T00:00:00+00:00"):
+    return {"user_id": USER, "amount": amount, "category_type": category,
+            "transaction_type": "expense", "transaction_date": date}
+
+
+def loaded_engine(spent=None):
+    engine = BudgetEngine(thresholds=(80, 100))
+    generation = engine.begin_rebuild(USER)
+    assert engine.rebuild(USER, generation, [{"category_type": "food", "monthly_limit": "100.00"}], spent or {})
+    engine.end_rebuild(USER)
+    return engine
+
+
+def test_counters_follow_creates_updates_and_deletes():
+    engine = loaded_engine({("2026-10", "food"): 5000})
+    engine.apply_transaction("create", expense("20.00"), None)
+    engine.apply_transaction("update", expense("25.00", category="fun"), expense("20.00"))
+    engine.apply_transaction("delete", None, expense("25.00", category="fun"))
+
+    status = engine.status(USER, "2026-10")
+    assert status["budgets"][0]["spent"] == Decimal("50.00")
+    assert status["unbudgeted_spent"] == Decimal("0.00")
+
+
+def test_threshold_crossings_raise_events_once():
+    engine = loaded_engine()
+    alerts = []
+    engine.on_alert(lambda user_id, alert: alerts.append((alert["threshold"], alert["direction"])))
+
+    engine.apply_transaction("create", expense("85.00"), None)
+    engine.apply_transaction("create", expense("1.00"), None)
+    engine.apply_transaction("create", expense("20.00"), None)
+    engine.apply_transaction("delete", None, expense("85.00"))
+
+    assert alerts == [(80, "up"), (100, "up"), (80, "down"), (100, "down")]
+    assert engine.status(USER, "2026-10")["budgets"][0]["thresholds_reached"] == []
+
+
+def test_overlapping_rebuilds_do_not_install_stale_counters(monkeypatch):
+    from routers import budgets as budgets_router
+
+    engine = BudgetEngine(thresholds=(80, 100))
+    monkeypatch.setattr(budgets_router, "budget_engine", engine)
+    history = [expense("10.00")]
+    first_read, write_done = asyncio.Event(), asyncio.Event()
+    reads = 0
+
+    async def get_budgets(user_id, table_name):
+        return [{"category_type": "food", "monthly_limit": "100.00"}]
+
+    async def get_transactions(user_id, columns):
+        nonlocal reads
+        reads += 1
+        rows = list(history)
+        if reads == 1:
+            # The first rebuild's read is slow: a write and a second rebuild overtake it
+            first_read.set()
+            await write_done.wait()
+        return rows, []
+
+    monkeypatch.setattr(budgets_router, "get_entities_by_user", get_budgets)
+    monkeypatch.setattr(budgets_router, "get_transactions_with_archive", get_transactions)
+
+    async def scenario():
+        first = asyncio.create_task(budgets_router.rebuild_budgets(USER))
+        await first_read.wait()
+        history.append(expense("30.00"))
+        engine.apply_transaction("create", expense("30.00"), None)
+        await budgets_router.rebuild_budgets(USER)
+        write_done.set()
+        await first
+
+    asyncio.run(scenario())
+    assert engine.status(USER, "2026-10")["budgets"][0]["spent"] == Decimal("40.00")
+    assert engine.stats()["rebuilding"] == 0
+
+
+def test_rebuild_waits_for_writes_in_flight(monkeypatch):
+    from routers import budgets as budgets_router
+
+    engine = BudgetEngine(thresholds=(80, 100))
+    monkeypatch.setattr(budgets_router, "budget_engine", engine)
+    history = [expense("10.00")]
+    reads = 0
+
+    async def get_budgets(user_id, table_name):
+        return [{"category_type": "food", "monthly_limit": "100.00"}]
+
+    async def get_transactions(user_id, columns):
+        nonlocal reads
+        reads += 1
+        if reads == 2:
+            # The write's response arrives and its listener runs
+            engine.apply_transaction("create", expense("30.00"), None)
+            engine.write_finished(expense("30.00"), None)
+        return list(history), []
+
+    monkeypatch.setattr(budgets_router, "get_entities_by_user", get_budgets)
+    monkeypatch.setattr(budgets_router, "get_transactions_with_archive", get_transactions)
+
+    # Committed before the first read, so every read already includes it
+    engine.write_started(expense("30.00"), None)
+    history.append(expense("30.00"))
+    asyncio.run(budgets_router.rebuild_budgets(USER))
+
+    assert reads == 3
+    assert engine.status(USER, "2026-10")["budgets"][0]["spent"] == Decimal("40.00")
+    assert engine.stats()["writes_in_flight"] == 0
+
+
+@pytest.mark.parametrize("error, unloaded", [
+    (APIError({"message": "upstream request timeout", "code": 504}), True),
+    (APIError({"message": "null value in column", "code": "23502"}), False),
+])
+def test_write_with_unknown_outcome_unloads_user(monkeypatch, error, unloaded):
+    monkeypatch.setattr(resilience, "storage_gate", ConcurrencyGate(limit=4, max_queue=4))
+    engine = loaded_engine()
+    listeners = defaultdict(list, {"transactions": [engine.apply_transaction]})
+    db = FakeSupabase()
+    db.write_error = error
+    monkeypatch.setattr(crud, "_entity_listeners", listeners)
+    monkeypatch.setattr(crud, "supabase", db)
+
+    transaction = TransactionCreate(user_id=USER, amount="20.00", category_type="food",
+                                    transaction_type="expense", location="Cafe")
+    with pytest.raises(HTTPException):
+        asyncio.run(crud.create_entity(transaction, "transactions"))
+    assert db.writes == 1
+    # The row may or may not be in storage, so the counters must be reloaded
+    assert engine.is_loaded(USER) is not unloaded
+
+
+@pytest.mark.parametrize("month", ["2026-13", "2026-00", "26-01", "2026/01"])
+def test_status_rejects_invalid_months(month):
+    import main
+    from auth.tokens import generate_jwt_token
+    from fastapi.testclient import TestClient
+
+    response = TestClient(main.app).get(
+        f"/api/budgets/{USER}",
+        params={"month": month},
+        headers={"Authorization": f"Bearer {generate_jwt_token(USER)}"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "month must be YYYY-MM"
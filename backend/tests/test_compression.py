@@ -0,0 +1,9 @@
+from utils.compression import choose_encoding
+
+
+def test_choose_encoding_follows_client_preferences():
+    assert choose_encoding("br;q=0.1, gzip;q=1") == "gzip"
+    assert choose_encoding("gzip, br") == "br"
+    assert choose_encoding("gzip;q=0.5, *;q=0.8") == "br"
+    assert choose_encoding("br;q=0, gzip;q=0") is None
+    assert choose_encoding("identity") is None
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from auth.dependencies import verify_stream_token
+from auth.tokens import generate_jwt_token, generate_stream_token
+from utils.live import LiveHub
+
+USER = "6f1c2b8e-5d3a-4c7e-9a1b-2c3d4e5f6a7b"
+
+
+def test_evicted_subscriber_always_gets_close():
+    async def scenario():
+        hub = LiveHub(max_per_user=1)
+        oldest = hub.subscribe(USER)
+        for i in range(oldest.queue.maxsize):
+            hub.publish(USER, {"type": "delta", "id": i})
+        hub.subscribe(USER)
+        events = []
+        while not oldest.queue.empty():
+            events.append(oldest.queue.get_nowait()["type"])
+        return events, hub.stats()["connections"]
+
+    events, connections = asyncio.run(scenario())
+    assert events == ["close"]
+    assert connections == 1
+
+
+def test_query_token_must_be_a_stream_token():
+    assert asyncio.run(verify_stream_token(token=generate_stream_token(USER), credentials=None)) == USER
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(verify_stream_token(token=generate_jwt_token(USER), credentials=None))
+    assert exc.value.status_code == 401
+
+
+def test_stream_token_endpoint_and_user_check():
+    import main
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {generate_jwt_token(USER)}"}
+    token = client.post("/api/live/token", headers=headers).json()["token"]
+    other_user = "00000000-0000-4000-8000-000000000000"
+    response = client.get(f"/api/live/dashboard/{other_user}", params={"token": token})
+    assert response.status_code == 403
+
+
+def test_logged_urls_do_not_carry_tokens():
+    from main import loggable_url
+
+    request = Request({
+        "type": "http", "method": "GET", "path": f"/api/live/dashboard/{USER}",
+        "query_string": b"token=secret.jwt.value&x=1", "headers": [],
+    })
+    assert loggable_url(request) == f"/api/live/dashboard/{USER}?token=REDACTED&x=1"
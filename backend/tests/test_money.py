@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+import pytest
+
+from models.transactions import Transaction
+from utils.money import MAX_CENTS, Cents, cents_to_decimal, storage_cents, to_cents
+
+
+@pytest.mark.parametrize("value, cents", [
+    ("12.5", 1250),
+    (" -3.05 ", -305),
+    ("+7", 700),
+    (".25", 25),
+    ("5.", 500),
+    ("1.500", 150),
+    (12, 1200),
+    (0.1, 10),
+    (Decimal("19.99"), 1999),
+    ("1e2", 10000),
+])
+def test_to_cents_accepts_decimal_amounts(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize("value", ["+-5", "--5", "-+5", "١٢", "12.345", "abc", "NaN", "", True, "1" * 12])
+def test_to_cents_rejects_malformed_amounts(value):
+    with pytest.raises(ValueError):
+        to_cents(value)
+
+
+def test_round_trip_and_storage_noise():
+    assert to_cents(str(cents_to_decimal(MAX_CENTS))) == MAX_CENTS
+    assert storage_cents(None) == 0
+    assert storage_cents(0.30000000000000004) == 30
+
+
+def test_cents_are_not_scaled_twice():
+    assert to_cents(to_cents(12)) == 1200
+    with pytest.raises(ValueError):
+        to_cents(Cents(MAX_CENTS + 1))
+
+
+def test_model_dump_round_trip_keeps_amount():
+    transaction = Transaction(
+        id=1,
+        user_id="6f1c2b8e-5d3a-4c7e-9a1b-2c3d4e5f6a7b",
+        amount="12.50",
+        category_type="food",
+        transaction_type="expense",
+        location="Cafe",
+    )
+    again = Transaction.model_validate(transaction.model_dump())
+    assert again.amount == 1250
+    assert Transaction.model_validate(again.model_dump()).amount == 1250
+    assert Transaction.model_validate_json(transaction.model_dump_json()).amount == 1250
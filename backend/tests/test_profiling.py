@@ -0,0 +1,59 @@
+import asyncio
+
+from db import resilience
+from db.resilience import CircuitBreaker, ConcurrencyGate, run_storage_call
+from tests.faults import FaultyBackend
+from utils.profiling import (
+    EVENT_LOOP_LABEL,
+    STORAGE_THREAD_LABEL,
+    activate_profile,
+    deactivate_profile,
+    start_profile,
+    finish_profile,
+)
+
+
+def test_sampled_profile_covers_storage_threads(monkeypatch):
+    monkeypatch.setattr(resilience, "storage_gate", ConcurrencyGate(limit=1, max_queue=0))
+
+    async def request():
+        profile = start_profile("GET", "/api/dashboard/x", requested=True)
+        token = activate_profile(profile)
+        try:
+            await run_storage_call(FaultyBackend([0.2]), breaker=CircuitBreaker("test"))
+        finally:
+            deactivate_profile(token)
+            finish_profile(profile, 200)
+        return profile
+
+    profile = asyncio.run(request())
+    by_thread = profile.samples_by_thread()
+    assert by_thread[STORAGE_THREAD_LABEL] > 0
+    assert set(by_thread) <= {STORAGE_THREAD_LABEL, EVENT_LOOP_LABEL}
+    storage_stacks = [stack for stack in profile.stacks if stack.startswith(STORAGE_THREAD_LABEL)]
+    assert any("faults.py" in stack for stack in storage_stacks)
+    assert [span["name"] for span in profile.spans] == ["storage_queue", "storage"]
+
+
+def test_span_totals_count_overlapping_spans_once(monkeypatch):
+    monkeypatch.setattr(resilience, "storage_gate", ConcurrencyGate(limit=4, max_queue=4))
+
+    async def request():
+        profile = start_profile("GET", "/api/dashboard/x", requested=False)
+        token = activate_profile(profile)
+        try:
+            breaker = CircuitBreaker("test")
+            await asyncio.gather(
+                run_storage_call(FaultyBackend([0.2]), breaker=breaker),
+                run_storage_call(FaultyBackend([0.2]), breaker=breaker),
+            )
+        finally:
+            deactivate_profile(token)
+            finish_profile(profile, 200)
+        return profile
+
+    profile = asyncio.run(request())
+    storage = [span for span in profile.spans if span["name"] == "storage"]
+    assert len(storage) == 2
+    assert sum(span["duration_ms"] for span in storage) > 350
+    assert 190 <= profile.span_totals()["storage"] <= profile.duration_ms
@@ -0,0 +1,183 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from postgrest.exceptions import APIError
+
+from db import resilience
+from db.resilience import (
+    CircuitBreaker,
+    ConcurrencyGate,
+    LatencyTracker,
+    StorageUnavailable,
+    run_storage_call,
+    start_request_budget,
+)
+from tests.faults import FakeClock, FaultyBackend
+
+
+@pytest.fixture(autouse=True)
+def fresh_gate(monkeypatch):
+    # asyncio primitives bind to the loop that first waits on them
+    monkeypatch.setattr(resilience, "storage_gate", ConcurrencyGate(limit=4, max_queue=4))
+
+
+def run(fn, **kwargs):
+    return asyncio.run(run_storage_call(fn, **kwargs))
+
+
+def test_breaker_opens_then_half_opens_then_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=30, clock=clock)
+    backend = FaultyBackend([ConnectionError("down"), ConnectionError("down")])
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            run(backend, breaker=breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Open: fails fast without touching the backend
+    with pytest.raises(StorageUnavailable) as exc:
+        run(backend, breaker=breaker)
+    assert exc.value.status_code == 503
+    assert exc.value.retry_after == 30
+    assert backend.calls == 2
+
+    clock.now = 31
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert run(backend, breaker=breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30, clock=clock)
+    with pytest.raises(ConnectionError):
+        run(FaultyBackend([ConnectionError()]), breaker=breaker)
+    clock.now = 31
+    with pytest.raises(ConnectionError):
+        run(FaultyBackend([ConnectionError()]), breaker=breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    clock = FakeClock()
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=30, clock=clock)
+    with pytest.raises(ConnectionError):
+        run(FaultyBackend([ConnectionError()]), breaker=breaker)
+    clock.now = 31
+
+    async def cancel_probe():
+        task = asyncio.create_task(run_storage_call(FaultyBackend([0.5]), breaker=breaker))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert run(FaultyBackend(), breaker=breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_server_errors_count_as_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    gateway = APIError({"message": "JSON could not be generated", "code": 502})
+    timeout = APIError({"message": "canceling statement due to statement timeout", "code": "57014"})
+    for error in (gateway, timeout):
+        with pytest.raises(APIError):
+            run(FaultyBackend([error]), breaker=breaker)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_client_errors_do_not_trip_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    not_null = APIError({"message": "null value in column", "code": "23502"})
+    with pytest.raises(APIError):
+        run(FaultyBackend([not_null]), breaker=breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_hedged_read_wins_over_slow_first_attempt():
+    latency = LatencyTracker()
+    for _ in range(20):
+        latency.record(0.01)
+    backend = FaultyBackend([1.0])
+
+    started = time.monotonic()
+    result = run(backend, hedge=True, breaker=CircuitBreaker("test"), latency=latency)
+    assert result == "ok"
+    assert backend.calls == 2
+    assert time.monotonic() - started < 0.5
+
+
+def test_request_deadline_gives_504():
+    async def call():
+        start_request_budget(0.1)
+        await run_storage_call(FaultyBackend([1.0]), breaker=CircuitBreaker("test"))
+
+    with pytest.raises(StorageUnavailable) as exc:
+        asyncio.run(call())
+    assert exc.value.status_code == 504
+
+
+def test_full_gate_sheds_with_503(monkeypatch):
+    monkeypatch.setattr(resilience, "storage_gate", ConcurrencyGate(limit=1, max_queue=0))
+    breaker = CircuitBreaker("test")
+
+    async def calls():
+        slow = asyncio.create_task(run_storage_call(FaultyBackend([0.3]), breaker=breaker))
+        await asyncio.sleep(0.05)
+        with pytest.raises(StorageUnavailable) as exc:
+            await run_storage_call(FaultyBackend(), breaker=breaker)
+        await slow
+        return exc.value
+
+    error = asyncio.run(calls())
+    assert error.status_code == 503
+    assert error.retry_after == 1
+    assert resilience.storage_gate.rejected == 1
+
+
+def test_unavailable_response_has_retry_after():
+    import main
+    from auth.tokens import generate_jwt_token
+
+    breaker = resilience.supabase_breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    user_id = "6f1c2b8e-5d3a-4c7e-9a1b-2c3d4e5f6a7b"
+    try:
+        response = TestClient(main.app).get(
+            f"/api/dashboard/{user_id}",
+            headers={"Authorization": f"Bearer {generate_jwt_token(user_id)}"},
+        )
+    finally:
+        breaker.record_success()
+    assert response.status_code == 503
+    assert 1 <= int(response.headers["Retry-After"]) <= breaker.reset_seconds
+
+
+def test_gate_slot_held_until_abandoned_call_returns(monkeypatch):
+    gate = ConcurrencyGate(limit=1, max_queue=0)
+    monkeypatch.setattr(resilience, "storage_gate", gate)
+    breaker = CircuitBreaker("test")
+
+    async def calls():
+        budget = start_request_budget(0.1)
+        with pytest.raises(StorageUnavailable) as exc:
+            await run_storage_call(FaultyBackend([0.5]), breaker=breaker)
+        assert exc.value.status_code == 504
+        resilience.reset_request_budget(budget)
+
+        # The timed-out call is still running on its executor thread
+        assert gate.in_flight == 1
+        with pytest.raises(StorageUnavailable):
+            await run_storage_call(FaultyBackend(), breaker=breaker)
+
+        await asyncio.sleep(0.5)
+        assert gate.in_flight == 0
+        return await run_storage_call(FaultyBackend(), breaker=breaker)
+
+    assert asyncio.run(calls()) == "ok"
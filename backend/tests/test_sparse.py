@@ -0,0 +1,48 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from models.assets import Asset
+from models.transactions import Transaction
+from utils.sparse import parse_fields, sparse_list_schema, sparse_response
+
+
+def test_parse_fields_keeps_id_and_rejects_unknown():
+    assert parse_fields(None, Transaction) is None
+    assert parse_fields("amount, category_type", Transaction) == ["id", "amount", "category_type"]
+    with pytest.raises(HTTPException) as exc:
+        parse_fields("amount,secret", Transaction)
+    assert exc.value.status_code == 400
+
+
+def test_sparse_response_keeps_validators_and_encoders():
+    columns = parse_fields("transaction_type,amount", Transaction)
+    response = sparse_response(Transaction, columns, [{"id": 1, "transaction_type": "EXPENSE", "amount": "12.50"}])
+    assert json.loads(response.body) == [{"id": 1, "transaction_type": "expense", "amount": "12.50"}]
+
+    columns = parse_fields("value", Asset)
+    response = sparse_response(Asset, columns, [{"id": 2, "value": "10.25"}])
+    assert json.loads(response.body) == [{"id": 2, "value": 10.25}]
+
+
+def test_list_schema_documents_full_and_sparse_rows():
+    import main
+
+    schema = main.app.openapi()
+    items = schema["paths"]["/api/transactions/user/{user_id}"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]["items"]
+    refs = {option["$ref"].rsplit("/", 1)[-1] for option in items["anyOf"]}
+    assert refs == {"Transaction", "TransactionFields"}
+    assert schema["components"]["schemas"]["TransactionFields"]["required"] == ["id"]
+
+
+def test_list_schema_validates_full_rows_against_full_model():
+    from pydantic import TypeAdapter
+
+    rows = TypeAdapter(sparse_list_schema(Transaction)).validate_python([{
+        "id": 1, "user_id": "6f1c2b8e-5d3a-4c7e-9a1b-2c3d4e5f6a7b", "amount": "1.00",
+        "category_type": "food", "transaction_type": "Expense", "location": "x",
+    }])
+    assert isinstance(rows[0], Transaction)
+    assert rows[0].transaction_type == "expense"
+
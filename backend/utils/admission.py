@@ -0,0 +1,163 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from fastapi import Depends, HTTPException, Request, status
+
+from auth.dependencies import verify_token
+from config import (
+    logger,
+    RATE_LIMIT_GLOBAL_PER_SECOND,
+    RATE_LIMIT_GLOBAL_BURST,
+    RATE_LIMIT_USER_PER_SECOND,
+    RATE_LIMIT_USER_BURST,
+    RATE_LIMIT_MAX_TRACKED_USERS,
+    RATE_LIMIT_CLIENT_PER_SECOND,
+    RATE_LIMIT_CLIENT_BURST,
+    RATE_LIMIT_TRUSTED_PROXY_HOPS,
+)
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def refund(self, tokens: float = 1) -> None:
+        """Give back tokens taken for a request that was not served after all."""
+        self._refill()
+        self._tokens = min(self.burst, self._tokens + tokens)
+
+    def available(self) -> float:
+        self._refill()
+        return self._tokens
+
+    def retry_after(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` will be available."""
+        self._refill()
+        missing = tokens - self._tokens
+        return max(missing / self.rate, 0)
+
+
+class KeyedRateLimiter:
+    """One token bucket per key, keeping only the most recently seen keys."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = RATE_LIMIT_MAX_TRACKED_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+global_bucket = TokenBucket(RATE_LIMIT_GLOBAL_PER_SECOND, RATE_LIMIT_GLOBAL_BURST)
+user_limiter = KeyedRateLimiter(RATE_LIMIT_USER_PER_SECOND, RATE_LIMIT_USER_BURST)
+client_limiter = KeyedRateLimiter(RATE_LIMIT_CLIENT_PER_SECOND, RATE_LIMIT_CLIENT_BURST)
+
+admission_counters = {
+    "admitted": 0,
+    "rejected_global": 0,
+    "rejected_user": 0,
+    "rejected_client": 0,
+}
+
+
+def _reject(counter: str, retry_after: float, detail: str):
+    admission_counters[counter] += 1
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def global_rate_limit():
+    """Dependency that sheds load once the whole worker is over its request rate."""
+    if not global_bucket.try_acquire():
+        logger.warning("Global rate limit exceeded, shedding request")
+        _reject("rejected_global", global_bucket.retry_after(), "Server is busy, please retry")
+    admission_counters["admitted"] += 1
+
+
+async def _keyed_then_global(bucket: TokenBucket) -> None:
+    """Apply the global limit after a keyed bucket has admitted the request."""
+    try:
+        await global_rate_limit()
+    except HTTPException:
+        # Shed globally: the request should not count against the key
+        bucket.refund()
+        raise
+
+
+async def user_rate_limit(user_id: str = Depends(verify_token)):
+    """Dependency applying the global limit and the authenticated user's own limit."""
+    bucket = user_limiter.bucket(user_id)
+    if not bucket.try_acquire():
+        logger.warning(f"Rate limit exceeded for user {user_id}")
+        _reject("rejected_user", bucket.retry_after(), "Too many requests")
+    await _keyed_then_global(bucket)
+    return user_id
+
+
+def client_address(request: Request) -> str:
+    """
+    Address of the calling client. Behind RATE_LIMIT_TRUSTED_PROXY_HOPS proxies
+    it is the X-Forwarded-For entry the outermost trusted proxy appended;
+    entries further left are client supplied and not trusted.
+    """
+    if RATE_LIMIT_TRUSTED_PROXY_HOPS > 0:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= RATE_LIMIT_TRUSTED_PROXY_HOPS:
+            return forwarded[-RATE_LIMIT_TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+async def client_rate_limit(request: Request):
+    """Dependency for routes without a user identity: per-client limit, then the global one."""
+    address = client_address(request)
+    bucket = client_limiter.bucket(address)
+    if not bucket.try_acquire():
+        logger.warning(f"Rate limit exceeded for client {address}")
+        _reject("rejected_client", bucket.retry_after(), "Too many requests")
+    await _keyed_then_global(bucket)
+
+
+def admission_stats() -> dict:
+    """Snapshot of admission counters for capacity planning."""
+    return {
+        **admission_counters,
+        "tracked_users": len(user_limiter),
+        "tracked_clients": len(client_limiter),
+        "global_tokens_available": round(global_bucket.available(), 2),
+    }
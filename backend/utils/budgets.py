@@ -0,0 +1,221 @@
+from collections import defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import logger, BUDGET_ALERT_THRESHOLDS, BUDGET_RECENT_ALERTS
+from db.archive import transaction_month
+from utils.money import storage_cents, cents_to_decimal
+
+
+def expense_key(row: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str, str]]:
+    """(user_id, month, category) a row's spend counts towards, or None."""
+    if not row or row.get("transaction_type") != "expense" or not row.get("user_id"):
+        return None
+    month = transaction_month(row.get("transaction_date"))
+    if month is None:
+        return None
+    return str(row["user_id"]), month, row.get("category_type") or "uncategorized"
+
+
+def _row_users(*rows: Optional[Dict[str, Any]]) -> List[str]:
+    return list(dict.fromkeys(str(row["user_id"]) for row in rows if row and row.get("user_id")))
+
+
+class UserBudgets:
+    """Limits and running spend counters for one user."""
+
+    def __init__(self):
+        self.limits: Dict[str, int] = {}
+        # (month, category) -> expense cents
+        self.spent: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.alerts = deque(maxlen=BUDGET_RECENT_ALERTS)
+
+
+class BudgetEngine:
+    """
+    Keeps per-user, per-category monthly spend counters up to date in O(1)
+    per transaction write and raises events when spend crosses a threshold
+    of the category's monthly limit.
+
+    Users are loaded lazily by rebuild(); writes for users that are not
+    loaded are ignored because the next rebuild reads them from history.
+    A write with an unknown outcome unloads its user for the same reason.
+    While rebuilds for a user are running, its writes bump a generation
+    counter, and a rebuild whose reads raced with a write is not installed.
+    Nor is one installed while a write for the user is in flight: its read
+    may already include the row, which the write's listener would add again.
+    """
+
+    def __init__(self, thresholds=BUDGET_ALERT_THRESHOLDS):
+        self.thresholds = sorted(thresholds)
+        self._users: Dict[str, UserBudgets] = {}
+        # Per-user write generation and rebuild count, only while rebuilding
+        self._generations: Dict[str, int] = {}
+        self._rebuilds: Dict[str, int] = {}
+        # Per-user count of writes sent to storage whose listeners have not run
+        self._writing: Dict[str, int] = {}
+        self._alert_handlers: List[Callable[[str, Dict[str, Any]], None]] = []
+
+    def on_alert(self, handler: Callable[[str, Dict[str, Any]], None]) -> None:
+        self._alert_handlers.append(handler)
+
+    def is_loaded(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def begin_rebuild(self, user_id: str) -> int:
+        """
+        Start tracking writes that race with a rebuild's history read. Returns
+        the generation to pass to rebuild(); pair every call with end_rebuild().
+        """
+        self._rebuilds[user_id] = self._rebuilds.get(user_id, 0) + 1
+        return self._generations.setdefault(user_id, 0)
+
+    def end_rebuild(self, user_id: str) -> None:
+        remaining = self._rebuilds[user_id] - 1
+        if remaining:
+            self._rebuilds[user_id] = remaining
+        else:
+            del self._rebuilds[user_id]
+            del self._generations[user_id]
+
+    def write_started(self, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+        """Write hook: a write for the rows' users is about to be sent."""
+        for user_id in _row_users(new_row, old_row):
+            self._writing[user_id] = self._writing.get(user_id, 0) + 1
+
+    def write_finished(self, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+        """Write hook: the write's listeners have run, or it failed."""
+        for user_id in _row_users(new_row, old_row):
+            remaining = self._writing.get(user_id, 0) - 1
+            if remaining > 0:
+                self._writing[user_id] = remaining
+            else:
+                self._writing.pop(user_id, None)
+
+    def _note_write(self, user_id: str) -> None:
+        if user_id in self._generations:
+            self._generations[user_id] += 1
+
+    def rebuild(self, user_id: str, generation: int, budgets: List[Dict[str, Any]], spent: Dict[Tuple[str, str], int]) -> bool:
+        """
+        Replace a user's state with limits and spend recomputed from history.
+        Returns False if a write arrived since begin_rebuild() or one is still
+        in flight; the caller retries.
+        """
+        if self._generations.get(user_id) != generation or self._writing.get(user_id):
+            return False
+        state = UserBudgets()
+        if user_id in self._users:
+            state.alerts = self._users[user_id].alerts
+        for budget in budgets:
+            state.limits[budget["category_type"]] = storage_cents(budget.get("monthly_limit"))
+        state.spent.update(spent)
+        self._users[user_id] = state
+        return True
+
+    def forget(self, user_id: str) -> None:
+        self._users.pop(user_id, None)
+
+    def _forget_rows(self, *rows: Optional[Dict[str, Any]]) -> None:
+        for user_id in _row_users(*rows):
+            self._note_write(user_id)
+            self.forget(user_id)
+
+    def apply_transaction(self, action: str, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+        """Entity listener for transactions: move the counters by the row delta."""
+        if action == "unknown":
+            self._forget_rows(new_row, old_row)
+            return
+        for row, sign in ((old_row, -1), (new_row, 1)):
+            key = expense_key(row)
+            if key is None:
+                continue
+            user_id, month, category = key
+            self._note_write(user_id)
+            state = self._users.get(user_id)
+            if state is None:
+                continue
+            before = state.spent[(month, category)]
+            after = before + sign * storage_cents(row.get("amount"))
+            state.spent[(month, category)] = after
+            self._check_thresholds(user_id, state, month, category, before, after)
+
+    def apply_budget(self, action: str, new_row: Optional[Dict[str, Any]], old_row: Optional[Dict[str, Any]]) -> None:
+        """Entity listener for budgets: keep limits in step with the table."""
+        if action == "unknown":
+            self._forget_rows(new_row, old_row)
+            return
+        for row, present in ((old_row, False), (new_row, True)):
+            if not row or not row.get("user_id"):
+                continue
+            user_id = str(row["user_id"])
+            self._note_write(user_id)
+            state = self._users.get(user_id)
+            if state is None:
+                continue
+            if present:
+                state.limits[row["category_type"]] = storage_cents(row.get("monthly_limit"))
+            else:
+                state.limits.pop(row["category_type"], None)
+
+    def _check_thresholds(self, user_id: str, state: UserBudgets, month: str, category: str, before: int, after: int) -> None:
+        limit = state.limits.get(category)
+        if not limit or limit <= 0:
+            return
+        for threshold in self.thresholds:
+            # Integer comparison: spent * 100 >= limit * threshold
+            was_over = before * 100 >= limit * threshold
+            is_over = after * 100 >= limit * threshold
+            if was_over == is_over:
+                continue
+            alert = {
+                "category_type": category,
+                "month": month,
+                "threshold": threshold,
+                "direction": "up" if is_over else "down",
+                "spent": cents_to_decimal(after),
+                "monthly_limit": cents_to_decimal(limit),
+            }
+            state.alerts.append(alert)
+            logger.info(f"Budget threshold {threshold}% crossed {alert['direction']} for user {user_id} in {category} ({month})")
+            for handler in self._alert_handlers:
+                try:
+                    handler(user_id, alert)
+                except Exception as e:
+                    logger.error(f"Budget alert handler failed: {str(e)}")
+
+    def status(self, user_id: str, month: str) -> Dict[str, Any]:
+        """Spend against each budget for a month, straight from the counters (as decimal amounts)."""
+        state = self._users[user_id]
+        budgets = []
+        for category, limit in sorted(state.limits.items()):
+            spent = state.spent.get((month, category), 0)
+            budgets.append({
+                "category_type": category,
+                "monthly_limit": cents_to_decimal(limit),
+                "spent": cents_to_decimal(spent),
+                "remaining": cents_to_decimal(limit - spent),
+                "percent_used": round(spent * 100 / limit, 2) if limit else 0.0,
+                "thresholds_reached": [t for t in self.thresholds if limit and spent * 100 >= limit * t],
+            })
+        unbudgeted = sum(
+            amount for (spent_month, category), amount in state.spent.items()
+            if spent_month == month and category not in state.limits
+        )
+        return {
+            "user_id": user_id,
+            "month": month,
+            "budgets": budgets,
+            "unbudgeted_spent": cents_to_decimal(unbudgeted),
+            "recent_alerts": list(state.alerts),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._users),
+            "counters": sum(len(state.spent) for state in self._users.values()),
+            "rebuilding": len(self._rebuilds),
+            "writes_in_flight": sum(self._writing.values()),
+        }
+
+
+budget_engine = BudgetEngine()
@@ -1,15 +1,21 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 from decimal import Decimal
 from datetime import datetime, date
 from uuid import UUID
+from utils.money import cents_to_decimal
 
-def prepare_data_for_supabase(data: Dict[str, Any]) -> Dict[str, Any]:
-    """Process model data to make it compatible with Supabase."""
+def prepare_data_for_supabase(data: Dict[str, Any], money_fields: Iterable[str] = ()) -> Dict[str, Any]:
+    """
+    Process model data to make it compatible with Supabase.
+    Money fields hold integer cents and are written as exact decimal strings.
+    """
     result = {}
     
     for key, value in data.items():
         if value is None:
             result[key] = None
+        elif key in money_fields:
+            result[key] = str(cents_to_decimal(value))
         elif key == "user_id":
             # Always convert user_id to string
             result[key] = str(value)
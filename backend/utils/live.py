@@ -0,0 +1,86 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict
+
+from config import logger, LIVE_QUEUE_SIZE, LIVE_MAX_CONNECTIONS_PER_USER
+
+# Sent instead of deltas a subscriber could not keep up with
+RESYNC_EVENT = {"type": "resync"}
+
+
+class Subscription:
+    """One connected client: a bounded queue of pending events."""
+
+    def __init__(self, user_id: str, queue_size: int = LIVE_QUEUE_SIZE):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        """
+        Queue an event without ever blocking the publisher. A subscriber that
+        falls behind loses its backlog and is told to resync (refetch) instead.
+        """
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+    def close(self, reason: str) -> None:
+        """Replace whatever is pending with a close event, which always gets through."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait({"type": "close", "reason": reason})
+
+
+class LiveHub:
+    """Per-user fan-out of change events to connected clients (in-process)."""
+
+    def __init__(self, max_per_user: int = LIVE_MAX_CONNECTIONS_PER_USER):
+        self.max_per_user = max_per_user
+        # Insertion-ordered so the oldest connection is first
+        self._subscribers: Dict[str, Dict[Subscription, None]] = defaultdict(dict)
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscribers = self._subscribers[user_id]
+        if len(subscribers) >= self.max_per_user:
+            # Newest connection wins; the oldest one is told to reconnect later
+            oldest = next(iter(subscribers))
+            oldest.close("too many connections")
+            del subscribers[oldest]
+        subscription = Subscription(user_id)
+        subscribers[subscription] = None
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.pop(subscription, None)
+        if not subscribers:
+            del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: str, event: Dict[str, Any]) -> None:
+        for subscription in list(self._subscribers.get(str(user_id), ())):
+            had_backlog = subscription.queue.full()
+            subscription.offer(event)
+            if had_backlog:
+                self.resyncs += 1
+                logger.warning(f"Live subscriber for user {user_id} fell behind, sent resync")
+        self.published += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "users": len(self._subscribers),
+            "connections": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+
+live_hub = LiveHub()
@@ -0,0 +1,83 @@
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+# Matches the numeric(12, 2) columns: at most 10 integer and 2 fractional digits
+MAX_CENTS = 10 ** 12 - 1
+
+# One optional sign and ASCII digits only, e.g. "12", "-3.5", ".25"
+_PLAIN_DECIMAL = re.compile(r"[+-]?(?:\d+(?:\.\d*)?|\.\d+)", re.ASCII)
+
+
+class Cents(int):
+    """An amount already converted to integer cents, so it is not scaled twice."""
+
+    __slots__ = ()
+
+
+def to_cents(value: Any) -> Cents:
+    """
+    Convert a decimal amount (int, str, float or Decimal) to integer cents.
+    Amounts with more than two decimal places are rejected rather than rounded;
+    Cents values pass through unchanged.
+    """
+    if isinstance(value, bool):
+        raise ValueError("Amount must be a number")
+    if isinstance(value, Cents):
+        cents = value
+    elif isinstance(value, int):
+        cents = value * 100
+    elif isinstance(value, str) and _PLAIN_DECIMAL.fullmatch(value.strip()):
+        cents = _parse_plain_decimal(value)
+    else:
+        if isinstance(value, str) and not value.isascii():
+            # Decimal() would accept other scripts' digits, e.g. "١٢"
+            raise ValueError(f"Invalid amount: {value!r}")
+        try:
+            # str() keeps floats at their shortest repr, so 0.1 stays 0.1
+            amount = value if isinstance(value, Decimal) else Decimal(str(value).strip())
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {value!r}")
+        if not amount.is_finite():
+            raise ValueError(f"Invalid amount: {value!r}")
+        scaled = amount.scaleb(2)
+        if scaled != scaled.to_integral_value():
+            raise ValueError("Amount must have at most 2 decimal places")
+        cents = int(scaled)
+
+    if abs(cents) > MAX_CENTS:
+        raise ValueError("Amount is too large")
+    return Cents(cents)
+
+
+def _parse_plain_decimal(value: str) -> int:
+    # Fast path for the common "1234.5" shape: no Decimal round trip
+    text = value.strip()
+    negative = text.startswith("-")
+    whole, _, fraction = text[1:].partition(".") if text[:1] in "+-" else text.partition(".")
+    fraction = fraction.rstrip("0") if len(fraction) > 2 else fraction
+    if len(fraction) > 2:
+        raise ValueError("Amount must have at most 2 decimal places")
+    cents = int(whole or "0") * 100 + int(fraction.ljust(2, "0"))
+    return -cents if negative else cents
+
+
+def cents_to_decimal(cents: int) -> Decimal:
+    """Integer cents back to a two-place Decimal, e.g. 1250 -> Decimal('12.50')."""
+    return Decimal(cents).scaleb(-2)
+
+
+def cents_to_float(cents: int) -> float:
+    """Integer cents to the nearest float, for JSON number outputs."""
+    return cents / 100
+
+
+def storage_cents(value: Any) -> int:
+    """Decode an amount read from storage; a missing amount counts as 0."""
+    if value is None:
+        return 0
+    try:
+        return to_cents(value)
+    except ValueError:
+        # Rows written as floats before amounts were exact may carry float noise
+        return int(Decimal(str(value)).quantize(Decimal("0.01")).scaleb(2))
@@ -0,0 +1,254 @@
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from config import (
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SLOW_THRESHOLD_MS,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_RING_SIZE,
+)
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("current_profile", default=None)
+_profile_ids = itertools.count(1)
+
+
+# Root frames of the collapsed stacks, telling apart whose samples they are
+EVENT_LOOP_LABEL = "[event loop: whole worker]"
+STORAGE_THREAD_LABEL = "[storage thread: this request]"
+
+
+class StackSampler:
+    """
+    Background thread that periodically samples the stacks of a set of
+    threads and aggregates the samples as collapsed stacks
+    ("label;root;child;leaf" -> count). Threads can join and leave while
+    sampling runs.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def add_thread(self, thread_id: int, label: str) -> None:
+        with self._lock:
+            self._threads[thread_id] = label
+
+    def remove_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self._threads.pop(thread_id, None)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = list(self._threads.items())
+            frames = sys._current_frames()
+            for thread_id, label in threads:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[f"{label};{_collapse(frame)}"] += 1
+
+
+def _collapse(frame) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class RequestProfile:
+    """Span timings (and optionally stack samples) for a single request."""
+
+    def __init__(self, method: str, path: str, sampled: bool):
+        self.id = next(_profile_ids)
+        self.method = method
+        self.path = path
+        self.sampled = sampled
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.spans: List[Dict] = []
+        self.stacks: Counter = Counter()
+        self._sampler: Optional[StackSampler] = None
+
+    def start_sampling(self) -> None:
+        # The event loop runs every concurrent request, so its samples are
+        # whole-worker; storage threads are added while they serve this request
+        self._sampler = StackSampler()
+        self._sampler.add_thread(threading.get_ident(), EVENT_LOOP_LABEL)
+        self._sampler.start()
+
+    def finish(self, status_code: int) -> None:
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        self.status_code = status_code
+        if self._sampler is not None:
+            self.stacks = self._sampler.stop()
+            self._sampler = None
+
+    def add_span(self, name: str, started: float, ended: float) -> None:
+        self.spans.append({
+            "name": name,
+            "start_ms": round((started - self._started) * 1000, 3),
+            "duration_ms": round((ended - started) * 1000, 3),
+        })
+
+    def span_totals(self) -> Dict[str, float]:
+        """
+        Wall time per span name. Overlapping spans of one name (e.g. storage
+        reads run with asyncio.gather) count once, so the totals add up to at
+        most the request's duration per name.
+        """
+        intervals: Dict[str, List] = {}
+        for span in self.spans:
+            intervals.setdefault(span["name"], []).append((span["start_ms"], span["start_ms"] + span["duration_ms"]))
+        totals: Dict[str, float] = {}
+        for name, spans in intervals.items():
+            total, covered_until = 0.0, float("-inf")
+            for start, end in sorted(spans):
+                if end > covered_until:
+                    total += end - max(start, covered_until)
+                    covered_until = end
+            totals[name] = round(total, 3)
+        return totals
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms or 0, 3),
+            "sampled": self.sampled,
+            "span_totals": self.span_totals(),
+        }
+
+    def samples_by_thread(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        for stack, count in self.stacks.items():
+            label = stack.split(";", 1)[0]
+            totals[label] = totals.get(label, 0) + count
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            **self.summary(),
+            "spans": self.spans,
+            "stack_samples": sum(self.stacks.values()),
+            "stack_samples_by_thread": self.samples_by_thread(),
+        }
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, ready for flamegraph.pl/speedscope."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class ProfileStore:
+    """Bounded ring buffer of captured request profiles."""
+
+    def __init__(self, size: int = PROFILE_RING_SIZE):
+        self._profiles = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles))
+
+    def get(self, profile_id: int) -> Optional[RequestProfile]:
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+
+profile_store = ProfileStore()
+
+
+def start_profile(method: str, path: str, requested: bool) -> RequestProfile:
+    """
+    Begin span collection for a request. Stack sampling only runs when the
+    request asked for it (authorized header) or was picked by the sample rate.
+    """
+    sampled = requested or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+    profile = RequestProfile(method, path, sampled)
+    if sampled:
+        profile.start_sampling()
+    return profile
+
+
+def finish_profile(profile: RequestProfile, status_code: int) -> bool:
+    """Stop the profile; keep it if it was sampled or slower than the threshold."""
+    profile.finish(status_code)
+    if profile.sampled or profile.duration_ms >= PROFILE_SLOW_THRESHOLD_MS:
+        profile_store.add(profile)
+        return True
+    return False
+
+
+def activate_profile(profile: RequestProfile):
+    return _current_profile.set(profile)
+
+
+def deactivate_profile(token) -> None:
+    _current_profile.reset(token)
+
+
+def sampled_call(fn: Callable[[], Any]) -> Callable[[], Any]:
+    """
+    Wrap a blocking call about to be handed to an executor so that, while it
+    runs, the current request's stack sampler (if any) samples that thread.
+    """
+    profile = _current_profile.get()
+    sampler = profile._sampler if profile is not None else None
+    if sampler is None:
+        return fn
+
+    def run():
+        thread_id = threading.get_ident()
+        sampler.add_thread(thread_id, STORAGE_THREAD_LABEL)
+        try:
+            return fn()
+        finally:
+            sampler.remove_thread(thread_id)
+    return run
+
+
+@contextmanager
+def span(name: str):
+    """Time a block as a named span of the current request, if any."""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, started, time.perf_counter())
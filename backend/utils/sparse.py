@@ -0,0 +1,90 @@
+from functools import lru_cache
+from typing import Annotated, Any, Dict, List, Optional, Tuple, Type, Union
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, Field, TypeAdapter, create_model, field_validator
+
+# Columns every sparse row keeps so the client can still address it
+ALWAYS_INCLUDED = ("id",)
+
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[List[str]]:
+    """
+    Parse a comma separated `fields=` query parameter into column names.
+    Returns None when no projection was requested.
+    """
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    columns = [name for name in ALWAYS_INCLUDED if name in model.model_fields]
+    for name in requested:
+        if name not in columns:
+            columns.append(name)
+    return columns
+
+
+def _field_validators(model: Type[BaseModel], columns: Tuple[str, ...]) -> Dict[str, Any]:
+    """Re-declare the model's field validators for the columns that are kept."""
+    validators = {}
+    for name, decorator in model.__pydantic_decorators__.field_validators.items():
+        fields = [field for field in decorator.info.fields if field in columns]
+        if fields:
+            func = getattr(decorator.func, "__func__", decorator.func)
+            validators[name] = field_validator(*fields, mode=decorator.info.mode)(func)
+    return validators
+
+
+@lru_cache(maxsize=128)
+def sparse_model(model: Type[BaseModel], columns: Tuple[str, ...]) -> Type[BaseModel]:
+    """Build (once per projection) a model with only the selected fields of `model`."""
+    definitions = {
+        name: (model.model_fields[name].annotation, model.model_fields[name])
+        for name in columns
+    }
+    return create_model(
+        f"{model.__name__}Fields",
+        __config__=model.model_config,
+        __validators__=_field_validators(model, columns),
+        **definitions,
+    )
+
+
+@lru_cache(maxsize=None)
+def sparse_list_schema(model: Type[BaseModel]):
+    """
+    response_model for list endpoints that take `fields=`: full rows, or rows
+    holding only the requested fields (every non-id field optional).
+    """
+    definitions = {}
+    for name, info in model.model_fields.items():
+        if name in ALWAYS_INCLUDED:
+            definitions[name] = (info.annotation, ...)
+        else:
+            definitions[name] = (Optional[info.annotation], None)
+    partial = create_model(
+        f"{model.__name__}Fields",
+        __config__=model.model_config,
+        __validators__=_field_validators(model, tuple(model.model_fields)),
+        **definitions,
+    )
+    # Full rows are checked against the full model first and only once
+    return List[Annotated[Union[model, partial], Field(union_mode="left_to_right")]]
+
+
+@lru_cache(maxsize=128)
+def _sparse_list_adapter(model: Type[BaseModel], columns: Tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(List[sparse_model(model, columns)])
+
+
+def sparse_response(model: Type[BaseModel], columns: List[str], data: List[Dict[str, Any]]) -> Response:
+    """
+    Validate rows against the projected model and serialize them as JSON.
+    The Response skips the route's response_model, whose schema
+    (sparse_list_schema) documents this shape.
+    """
+    adapter = _sparse_list_adapter(model, tuple(columns))
+    return Response(content=adapter.dump_json(adapter.validate_python(data)), media_type="application/json")